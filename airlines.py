@@ -0,0 +1,379 @@
+"""
+Registry of airline and card issuer sites, and the clients that query them.
+
+The registry is loaded from the `airlines` and `card_issuers` tables at startup
+and kept in memory.  Flight searches fan out to every registered airline in
+parallel over keep-alive HTTP connections; each airline has its own timeout and
+circuit breaker, so a slow or failing site only removes its own flights from
+the merged `lista_vuelos` response.
+"""
+import http.client
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlencode, urlsplit
+from xml.etree.ElementTree import ParseError
+
+from metrics import upstream_latency
+from serializers import parse_document
+
+Airline = namedtuple('Airline', 'code name host script_lista_vuelos script_lista_asientos script_reserva')
+CardIssuer = namedtuple('CardIssuer', 'code name host script_autorizacion card_prefix')
+
+
+class UpstreamError(Exception):
+    """Raised when a remote airline or issuer site fails or cannot be reached."""
+
+
+# --- REGISTRY ---
+class Registry:
+    """In-memory copy of the airline and card issuer registry."""
+
+    def __init__(self):
+        self._airlines = {}
+        self._issuers = {}
+
+    def load(self, conn):
+        """Reloads both registries from the database in one pass."""
+        cursor = conn.cursor()
+        cursor.execute('SELECT code, name, host, script_lista_vuelos, script_lista_asientos, script_reserva FROM airlines WHERE active ORDER BY code')
+        airlines = [Airline(*row) for row in cursor.fetchall()]
+        cursor.execute('SELECT code, name, host, script_autorizacion, card_prefix FROM card_issuers WHERE active ORDER BY code')
+        issuers = [CardIssuer(*row) for row in cursor.fetchall()]
+        cursor.close()
+        self.replace(airlines, issuers)
+
+    def replace(self, airlines, issuers=()):
+        # Swap whole dicts so readers never see a half-loaded registry.
+        self._airlines = {a.code: a for a in airlines}
+        self._issuers = {i.code: i for i in issuers}
+
+    def airlines(self):
+        return list(self._airlines.values())
+
+    def airline(self, code):
+        return self._airlines.get(code)
+
+    def issuers(self):
+        return list(self._issuers.values())
+
+    def issuer_for_card(self, tarjeta):
+        """Returns the issuer with the longest matching card prefix, if any."""
+        best = None
+        for issuer in self._issuers.values():
+            if tarjeta.startswith(issuer.card_prefix) and (best is None or len(issuer.card_prefix) > len(best.card_prefix)):
+                best = issuer
+        return best
+
+    def as_dict(self):
+        return {
+            "aerolineas": [a._asdict() for a in self.airlines()],
+            "emisores": [i._asdict() for i in self.issuers()],
+        }
+
+
+# --- HTTP CLIENT ---
+class HttpClient:
+    """GET-only HTTP client that keeps one persistent connection per thread and host."""
+
+    def __init__(self, timeout=2.0):
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def get(self, host, script, params, timeout=None, parse=None):
+        """
+        Returns (status, content_type, body) for GET http://host/script?params.
+        With ``parse``, body is ``parse(response, content_type)``, read straight off the socket.
+        """
+        parts = urlsplit(host if '://' in host else 'http://' + host)
+        target = parts.path.rstrip('/') + '/' + script.lstrip('/') + '?' + urlencode(params)
+        timeout = self.timeout if timeout is None else timeout
+        key = (parts.scheme, parts.netloc)
+
+        for attempt in range(2):
+            conn, reused = self._connection(key, timeout)
+            try:
+                conn.request('GET', target)
+                response = conn.getresponse()
+                content_type = response.getheader('Content-Type', '')
+                if parse is None:
+                    body = response.read()
+                else:
+                    body = parse(response, content_type)
+                    # Drain what the parser left so the connection can be reused
+                    response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self._drop(key)
+                # The server may have closed an idle keep-alive connection; retry once on a fresh one.
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                self._drop(key)
+                raise
+            if response.will_close:
+                self._drop(key)
+            return response.status, content_type, body
+
+    def _connection(self, key, timeout):
+        pool = getattr(self._local, 'connections', None)
+        if pool is None:
+            pool = self._local.connections = {}
+        conn = pool.get(key)
+        if conn is not None:
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            conn.timeout = timeout
+            return conn, True
+        scheme, netloc = key
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        conn = pool[key] = cls(netloc, timeout=timeout)
+        return conn, False
+
+    def _drop(self, key):
+        conn = getattr(self._local, 'connections', {}).pop(key, None)
+        if conn is not None:
+            conn.close()
+
+
+# --- CIRCUIT BREAKER ---
+class CircuitBreaker:
+    """
+    Opens after ``threshold`` consecutive failures and rejects calls for
+    ``reset_after`` seconds, then lets a single trial call through (half-open).
+    """
+
+    def __init__(self, threshold=5, reset_after=30.0):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            return 'half-open' if time.monotonic() - self._opened_at >= self.reset_after else 'open'
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_after or self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+    def release(self):
+        """Gives back a call granted by allow() that was never made, so the next trial can run."""
+        with self._lock:
+            self._trial = False
+
+
+class _Site:
+    """Shared plumbing for calling registered sites through per-site circuit breakers."""
+
+    def __init__(self, registry, client=None, timeout=2.0, breaker_threshold=5, breaker_reset=30.0, formato='JSON'):
+        self.registry = registry
+        self.client = client or HttpClient(timeout)
+        self.timeout = timeout
+        # Format requested from remote sites; responses are parsed by their Content-Type either way
+        self.formato = formato
+        self._breaker_args = (breaker_threshold, breaker_reset)
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, code):
+        breaker = self._breakers.get(code)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(code, CircuitBreaker(*self._breaker_args))
+        return breaker
+
+    def breaker_states(self):
+        """{site code: 'closed' | 'open' | 'half-open'} for every site called so far."""
+        return {code: breaker.state for code, breaker in list(self._breakers.items())}
+
+    def _call(self, code, host, script, params):
+        breaker = self.breaker(code)
+        started = time.perf_counter()
+        try:
+            status, _, payload = self.client.get(host, script, dict(params, formato=self.formato), self.timeout, parse=_parse_response)
+            if status >= 500:
+                raise UpstreamError(f"{code} answered HTTP {status}")
+        except (OSError, http.client.HTTPException, ValueError, ParseError) as e:
+            breaker.record_failure()
+            upstream_latency.observe(time.perf_counter() - started, code, script, 'timeout' if isinstance(e, TimeoutError) else 'error')
+            raise UpstreamError(f"{code}: {e}") from e
+        except UpstreamError:
+            breaker.record_failure()
+            upstream_latency.observe(time.perf_counter() - started, code, script, 'error')
+            raise
+        breaker.record_success()
+        upstream_latency.observe(time.perf_counter() - started, code, script, 'ok')
+        return status, payload
+
+
+def _parse_response(response, content_type):
+    if response.status >= 500:
+        return None
+    return parse_document(response, content_type)
+
+
+# --- FLIGHT SEARCH ---
+class FlightSearch(_Site):
+    """
+    Queries `script_lista_vuelos` on every registered airline concurrently.
+
+    ``timeout`` bounds each airline call; ``deadline`` bounds the whole search.
+    Airlines that miss the deadline, fail, or have an open breaker are listed
+    in `aerolineas_sin_respuesta` and the response is marked `parcial`.  Calls
+    still queued at the deadline are cancelled, and at most ``max_queued``
+    calls wait for a thread; beyond that an airline is skipped rather than
+    queued behind work no search is waiting for.
+    """
+
+    def __init__(self, registry, client=None, timeout=2.0, deadline=2.5, max_workers=16, max_queued=None, **breaker):
+        super().__init__(registry, client, timeout, **breaker)
+        self.deadline = deadline
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='airline')
+        self._slots = threading.BoundedSemaphore(max_workers + (max_workers if max_queued is None else max_queued))
+
+    def search(self, origen, destino, fecha):
+        params = {"origen": origen, "destino": destino, "fecha": fecha}
+        skipped = []
+        futures = {}
+        for airline in self.registry.airlines():
+            if not self._slots.acquire(blocking=False):
+                skipped.append(airline.code)
+            elif not self.breaker(airline.code).allow():
+                self._slots.release()
+                skipped.append(airline.code)
+            else:
+                future = self._executor.submit(self._query, airline, params)
+                future.add_done_callback(lambda _: self._slots.release())
+                futures[future] = airline.code
+
+        done, pending = wait(futures, timeout=self.deadline)
+        for future in pending:
+            if future.cancel():
+                self.breaker(futures[future]).release()
+        vuelos = []
+        for future in done:
+            if future.exception() is None:
+                vuelos.extend(future.result())
+            else:
+                skipped.append(futures[future])
+        skipped.extend(futures[f] for f in pending)
+        vuelos.sort(key=lambda v: (v["hora"], v["aerolinea"], v["numero"]))
+
+        return {
+            "lista_vuelos": {
+                "fecha": fecha,
+                "origen": origen,
+                "destino": destino,
+                "vuelos": vuelos,
+                "parcial": bool(skipped),
+                "aerolineas_sin_respuesta": sorted(skipped),
+            }
+        }
+
+    def _query(self, airline, params):
+        _, payload = self._call(airline.code, airline.host, airline.script_lista_vuelos, params)
+        return parse_flights(airline.code, payload)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def parse_flights(code, payload):
+    """Converts a parsed remote `lista_vuelos` document into the merged flight format."""
+    lista = payload.get('lista_vuelos', payload)
+    vuelos = lista.get('vuelos') or []
+    if isinstance(vuelos, dict):
+        vuelos = [vuelos]
+    return [
+        {
+            "aerolinea": code,
+            "numero": str(v.get('numero', '')),
+            "hora": str(v.get('hora', '')),
+            "precio": str(v.get('precio', '')),
+        }
+        for v in vuelos
+    ]
+
+
+# --- SEAT LISTINGS ---
+class SeatListing(_Site):
+    """Fetches `script_lista_asientos` from the airline that operates a flight."""
+
+    def fetch(self, aerolinea, vuelo, fecha):
+        """
+        Returns the normalized `lista_asientos` dict, or None when the airline
+        is not registered.  Raises UpstreamError if the airline fails.
+        """
+        airline = self.registry.airline(aerolinea)
+        if airline is None:
+            return None
+        if not self.breaker(airline.code).allow():
+            raise UpstreamError(f"{airline.code} is temporarily unavailable")
+        params = {"aerolinea": aerolinea, "vuelo": vuelo, "fecha": fecha}
+        _, payload = self._call(airline.code, airline.host, airline.script_lista_asientos, params)
+        return parse_seats(airline.code, payload)
+
+
+def parse_seats(code, payload):
+    """Converts a parsed remote `lista_asientos` document into this site's format."""
+    lista = payload.get('lista_asientos', payload)
+    asientos = lista.get('asientos') or []
+    if isinstance(asientos, dict):
+        asientos = [asientos]
+    return {
+        "aerolinea": code,
+        "numero": str(lista.get('numero', '')),
+        "fecha": str(lista.get('fecha', '')),
+        "origen": lista.get('origen', ''),
+        "destino": lista.get('destino', ''),
+        "avion": lista.get('avion', ''),
+        "asientos": [
+            {"fila": str(a.get('fila', '')), "posicion": a.get('posicion', '')}
+            for a in asientos
+        ],
+    }
+
+
+# --- CARD ISSUERS ---
+class IssuerClient(_Site):
+    """Forwards payment authorizations to the issuer registered for the card prefix."""
+
+    def authorize(self, params):
+        """
+        Returns the issuer's `autorizacion` dict, or None when no issuer is
+        registered for the card.  Raises UpstreamError if the issuer fails.
+        """
+        issuer = self.registry.issuer_for_card(params.get('tarjeta') or '')
+        if issuer is None:
+            return None
+        if not self.breaker(issuer.code).allow():
+            raise UpstreamError(f"{issuer.code} is temporarily unavailable")
+        _, payload = self._call(issuer.code, issuer.host, issuer.script_autorizacion, params)
+        autorizacion = payload.get('autorizacion', payload)
+        autorizacion.setdefault('emisor', issuer.code)
+        return autorizacion
@@ -1,15 +1,32 @@
+import json
+import logging
+import multiprocessing
 import os
 import psycopg2
 import psycopg2.extras
-import uuid
 from datetime import datetime
-from flask import Flask, jsonify, request, send_from_directory
-from flask_bcrypt import Bcrypt
+from flask import Flask, Response, jsonify, request, send_from_directory
 from dotenv import load_dotenv
+from airlines import FlightSearch, HttpClient, IssuerClient, Registry, SeatListing, UpstreamError
+from bookings import SeatConflict, UnknownUser, claim_seats, validate_seats
+from cache import TTLCache
+from db import PoolTimeout, pool_from_env
+from hashing import HasherBusy, hasher_from_env
+from logs import configure_logging
+from metrics import CONTENT_TYPE, REGISTRY, TimedConnection, instrument, stats_families
+from seat_index import SeatIndex, seat_mask, seats_from_mask
+from serializers import XML_DECLARATION, iter_xml, iter_xml_items
 
 load_dotenv()
+# Hashing workers started with spawn, and the forkserver, re-import the main script: this file
+# as __mp_main__ when run as `python app.py`, or a launcher that imports it.  They must not load
+# the registry or the seat index from the database.  multiprocessing flags that import with
+# _inheriting (it is what raises "before the current process has finished its bootstrapping phase").
+IN_WORKER = getattr(multiprocessing.current_process(), '_inheriting', False)
+configure_logging()
+log = logging.getLogger('trivago.app')
 app = Flask(__name__, static_folder='.', static_url_path='')
-bcrypt = Bcrypt(app)
+instrument(app, slow_ms=float(os.getenv("LOG_SLOW_MS", "500")))
 
 # Enable CORS for all routes
 @app.after_request
@@ -27,10 +44,85 @@ mock_seats_response = {
     "lista_asientos": { "aerolinea": "AA", "numero": "926", "fecha": "20251115", "origen": "GUA", "destino": "MIA", "avion": "Boeing 737", "asientos": [ {"fila": "1", "posicion": "A"}, {"fila": "1", "posicion": "B"}, {"fila": "2", "posicion": "C"}, {"fila": "2", "posicion": "D"}, {"fila": "5", "posicion": "A"}, {"fila": "10", "posicion": "B"} ] }
 }
 
-# --- DATABASE AND CORE FUNCTIONS (Unchanged) ---
+# --- DATABASE AND CORE FUNCTIONS ---
+db_pool = pool_from_env(connection_factory=TimedConnection)
+
 def get_db_connection():
-    conn = psycopg2.connect(host=os.getenv("DB_HOST"), database=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASSWORD"), port=os.getenv("DB_PORT"))
-    return conn
+    """Checks out a pooled connection; use as `with get_db_connection() as conn:`."""
+    return db_pool.connection()
+
+def requested_format():
+    """JSON or XML, from the `formato` parameter (query string or JSON body) or else the Accept header."""
+    formato = request.args.get('formato')
+    if formato is None and request.is_json:
+        body = request.get_json(silent=True)
+        formato = body.get('formato') if isinstance(body, dict) else None
+    # A JSON body can carry any type; only strings name a format
+    if formato and isinstance(formato, str):
+        return formato.upper()
+    best = request.accept_mimetypes.best_match(['application/json', 'application/xml', 'text/xml'])
+    return 'XML' if best in ('application/xml', 'text/xml') else 'JSON'
+
+def respond(payload):
+    """Serializes an API response in the requested format; XML is streamed from templates."""
+    if requested_format() == 'XML':
+        return Response(iter_xml(payload), mimetype='application/xml')
+    return jsonify(payload)
+
+def busy_response():
+    return respond({"error": "Service temporarily unavailable, please retry"}), 503
+
+# --- PASSWORD HASHING ---
+# The worker processes start with the first register or login
+hasher = hasher_from_env()
+
+def hasher_busy_response():
+    return respond({"error": "Too many login attempts in progress, please retry"}), 429, {'Retry-After': '1'}
+
+# --- AIRLINE AND CARD ISSUER REGISTRY ---
+registry = Registry()
+http_client = HttpClient()
+remote_format = os.getenv("REMOTE_FORMAT", "JSON")
+flight_search = FlightSearch(registry, http_client, timeout=float(os.getenv("AIRLINE_TIMEOUT", "2")), deadline=float(os.getenv("SEARCH_DEADLINE", "2.5")), formato=remote_format)
+seat_listing = SeatListing(registry, http_client, timeout=float(os.getenv("AIRLINE_TIMEOUT", "2")), formato=remote_format)
+issuer_client = IssuerClient(registry, http_client, timeout=float(os.getenv("ISSUER_TIMEOUT", "5")), formato=remote_format)
+
+def load_registry():
+    try:
+        with get_db_connection() as conn:
+            registry.load(conn)
+    except Exception as e:
+        log.warning("Could not load airline registry: %s", e)
+
+if not IN_WORKER:
+    load_registry()
+
+# --- AVAILABILITY CACHE ---
+# Partial searches (an airline missed the deadline) are served but not cached.
+flights_cache = TTLCache(
+    ttl=float(os.getenv("FLIGHTS_CACHE_TTL", "60")),
+    stale_ttl=float(os.getenv("FLIGHTS_CACHE_STALE", "120")),
+    maxsize=int(os.getenv("CACHE_MAX_ENTRIES", "2048")),
+    cache_if=lambda response: not response["lista_vuelos"].get("parcial"),
+)
+seats_cache = TTLCache(
+    ttl=float(os.getenv("SEATS_CACHE_TTL", "15")),
+    stale_ttl=float(os.getenv("SEATS_CACHE_STALE", "15")),
+    maxsize=int(os.getenv("CACHE_MAX_ENTRIES", "2048")),
+)
+
+# --- SEAT INDEX ---
+seat_index = SeatIndex(max_age=float(os.getenv("SEAT_INDEX_MAX_AGE", "60")), maxsize=int(os.getenv("SEAT_INDEX_MAX_FLIGHTS", "50000")))
+
+def warm_seat_index():
+    try:
+        with get_db_connection() as conn:
+            seat_index.warm(conn, since=datetime.now().date())
+    except Exception as e:
+        log.warning("Could not build seat index: %s", e)
+
+if not IN_WORKER:
+    warm_seat_index()
 
 # --- FRONTEND ROUTES ---
 @app.route('/')
@@ -48,10 +140,15 @@ def get_flights():
     origen = request.args.get('origen', 'GUA')
     destino = request.args.get('destino', 'MIA') 
     fecha = request.args.get('fecha', '20251115')
-    formato = request.args.get('formato', 'JSON')
-    
-    # Update mock response with actual parameters
-    response = {
+
+    return respond(flights_cache.get_or_load((origen, destino, fecha), lambda: search_flights(origen, destino, fecha)))
+
+def search_flights(origen, destino, fecha):
+    if registry.airlines():
+        return flight_search.search(origen, destino, fecha)
+
+    # No airlines registered yet: keep serving the sample listing
+    return {
         "lista_vuelos": { 
             "aerolinea": "AA", 
             "fecha": fecha, 
@@ -63,7 +160,6 @@ def get_flights():
             ] 
         }
     }
-    return jsonify(response)
 
 @app.route('/api/seats', methods=['GET'])
 def get_available_seats():
@@ -71,97 +167,272 @@ def get_available_seats():
     aerolinea = request.args.get('aerolinea', 'AA')
     vuelo = request.args.get('vuelo', '926')
     fecha = request.args.get('fecha', '20251115')
-    formato = request.args.get('formato', 'JSON')
     
-    # Update mock response with actual parameters (fixing spec inconsistencies)
-    response = {
-        "lista_asientos": { 
-            "aerolinea": aerolinea, 
-            "numero": vuelo, 
-            "fecha": fecha, 
-            "origen": "GUA",  # Fixed from "origin" in spec
-            "destino": "MIA", # Fixed from "design" in spec
-            "avion": "Boeing 737", 
-            "asientos": [ 
-                {"fila": "1", "posicion": "A"},  # Fixed from "file"/"position" in spec
-                {"fila": "1", "posicion": "B"}, 
-                {"fila": "2", "posicion": "C"}, 
-                {"fila": "2", "posicion": "D"}, 
-                {"fila": "5", "posicion": "A"}, 
-                {"fila": "10", "posicion": "B"} 
-            ] 
-        }
-    }
-    return jsonify(response)
+    try:
+        flight_date = datetime.strptime(fecha, '%Y%m%d').date()
+        lista, offered = seats_cache.get_or_load((aerolinea, vuelo, fecha), lambda: load_seats(aerolinea, vuelo, fecha, flight_date))
+        booked = seat_index.booked(get_db_connection, f"{aerolinea}{vuelo}", flight_date)
+    except ValueError:
+        return respond({"error": "Invalid date, expected YYYYMMDD"}), 400
+    except UpstreamError as e:
+        log.warning("Error fetching seats: %s", e)
+        return respond({"error": "The airline is not available"}), 502
+    except PoolTimeout:
+        return busy_response()
+    except psycopg2.Error as e:
+        log.warning("Database error fetching seats: %s", e)
+        return respond({"error": "A database error occurred"}), 500
+    return respond({"lista_asientos": dict(lista, asientos=seats_from_mask(offered & ~booked))})
+
+def load_seats(aerolinea, vuelo, fecha, flight_date):
+    """
+    The airline's seat list (or the sample one) as its header fields and a seat
+    mask, which is also recorded in the seat index for group queries.
+    """
+    lista = seat_listing.fetch(aerolinea, vuelo, fecha)
+    if lista is None:
+        lista = dict(mock_seats_response["lista_asientos"], aerolinea=aerolinea, numero=vuelo, fecha=fecha)
+    lista = dict(lista)
+    asientos = lista.pop("asientos")
+    offered = seat_mask(f"{a['fila']}{a['posicion']}" for a in asientos)
+    seat_index.set_offered(f"{aerolinea}{vuelo}", flight_date, offered)
+    return lista, offered
+
+@app.route('/api/seats/blocks', methods=['GET'])
+def get_flights_with_free_block():
+    """
+    Lists flights with at least `asientos` adjacent free seats in one row, among
+    the seats their airline offers.  Only flights whose seat map this process
+    has fetched through /api/seats are known; the response says how many.
+    Expected parameters: asientos, fecha (optional)
+    """
+    fecha = request.args.get('fecha')
+    try:
+        n = int(request.args.get('asientos', '2'))
+        flight_date = datetime.strptime(fecha, '%Y%m%d').date() if fecha else None
+    except ValueError:
+        return respond({"error": "Invalid parameters"}), 400
+    flights = seat_index.flights_with_free_block(n, flight_date)
+    return respond({
+        "vuelos": [{"codigo": code, "fecha": day.strftime('%Y%m%d')} for code, day in sorted(flights)],
+        "vuelos_indexados": seat_index.stats()["seat_maps"],
+        "nota": "Only flights whose seat map has been loaded by this server are searched",
+    })
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return respond({"flights": flights_cache.stats(), "seats": seats_cache.stats(), "seat_index": seat_index.stats()})
+
+# --- METRICS ---
+BREAKER_STATES = {"closed": 0, "half-open": 1, "open": 2}
+
+@REGISTRY.collector
+def collect_component_stats():
+    families = stats_families('db_pool', [({}, db_pool.stats())], counters=('checkouts', 'timeouts', 'created', 'recycled'))
+    families += stats_families('cache', [({"cache": "flights"}, flights_cache.stats()), ({"cache": "seats"}, seats_cache.stats())],
+                               counters=('hits', 'stale_hits', 'misses', 'coalesced', 'evictions', 'load_errors'))
+    families += stats_families('seat_index', [({}, seat_index.stats())], counters=('hits', 'misses', 'evictions'))
+    families += stats_families('password_hasher', [({}, hasher.stats())], counters=('rejected', 'timeouts', 'upgraded'))
+    breakers = [
+        ('upstream_breaker_state', {"site": code, "kind": kind}, BREAKER_STATES[state])
+        for kind, site in (("lista_vuelos", flight_search), ("lista_asientos", seat_listing), ("autorizacion", issuer_client))
+        for code, state in sorted(site.breaker_states().items())
+    ]
+    families.append(('upstream_breaker_state', 'gauge', 'Circuit breaker per site: 0 closed, 1 half-open, 2 open', breakers))
+    return families
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Request, SQL, upstream and bcrypt latency histograms plus pool/cache/index counters, in Prometheus text format."""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
 
 @app.route('/api/register', methods=['POST'])
 def register_user():
     data = request.get_json()
     full_name, email, password, travel_document = data.get('full_name'), data.get('email'), data.get('password'), data.get('travel_document')
     if not all([full_name, email, password]):
-        return jsonify({"error": "Missing required fields"}), 400
-    password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        return respond({"error": "Missing required fields"}), 400
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('INSERT INTO users (full_name, email, password_hash, travel_document) VALUES (%s, %s, %s, %s)', (full_name, email, password_hash, travel_document))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return jsonify({"message": "User registered successfully"}), 201
+        password_hash = hasher.hash(password)
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('INSERT INTO users (full_name, email, password_hash, travel_document) VALUES (%s, %s, %s, %s)', (full_name, email, password_hash, travel_document))
+            conn.commit()
+            cursor.close()
+        return respond({"message": "User registered successfully"}), 201
     except psycopg2.IntegrityError:
-        return jsonify({"error": "Email already registered"}), 409
-    except Exception as e:
-        print(f"Error registering user: {e}")
-        return jsonify({"error": "An internal error occurred"}), 500
+        return respond({"error": "Email already registered"}), 409
+    except HasherBusy:
+        return hasher_busy_response()
+    except PoolTimeout:
+        return busy_response()
+    except Exception:
+        log.exception("Error registering user")
+        return respond({"error": "An internal error occurred"}), 500
 
 @app.route('/api/login', methods=['POST'])
 def login_user():
     data = request.get_json()
     email, password = data.get('email'), data.get('password')
     if not all([email, password]):
-        return jsonify({"error": "Missing required fields"}), 400
+        return respond({"error": "Missing required fields"}), 400
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        cursor.execute('SELECT * FROM users WHERE email = %s;', (email,))
-        user = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        if user and bcrypt.check_password_hash(user['password_hash'], password):
-            return jsonify({"message": "Login successful", "user": {"id": user['id'], "full_name": user['full_name'], "email": user['email']}})
-        else:
-            return jsonify({"error": "Invalid credentials"}), 401
+        with get_db_connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+            cursor.execute('SELECT id, full_name, email, password_hash FROM users WHERE email = %s;', (email,))
+            user = cursor.fetchone()
+            cursor.close()
+        # The connection is not held while bcrypt runs in the hashing pool.
+        if user is None:
+            # Unknown email: same bcrypt work as a real check, so response time does not reveal which emails exist
+            hasher.verify_dummy(password)
+            return respond({"error": "Invalid credentials"}), 401
+        ok, new_hash = hasher.verify(password, user['password_hash'])
+        if not ok:
+            return respond({"error": "Invalid credentials"}), 401
+        if new_hash is not None:
+            upgrade_password_hash(user['id'], user['password_hash'], new_hash)
+        return respond({"message": "Login successful", "user": {"id": user['id'], "full_name": user['full_name'], "email": user['email']}})
+    except HasherBusy:
+        return hasher_busy_response()
+    except PoolTimeout:
+        return busy_response()
+    except Exception:
+        log.exception("Error during login")
+        return respond({"error": "An internal error occurred"}), 500
+
+def upgrade_password_hash(user_id, old_hash, new_hash):
+    """Stores a hash rehashed at the current cost, unless the password was changed meanwhile. Best effort."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('UPDATE users SET password_hash = %s WHERE id = %s AND password_hash = %s', (new_hash, user_id, old_hash))
+            conn.commit()
+            cursor.close()
     except Exception as e:
-        print(f"Error during login: {e}")
-        return jsonify({"error": "An internal error occurred"}), 500
+        log.warning("Could not upgrade password hash for user %s: %s", user_id, e)
+
+@app.route('/api/registry', methods=['GET'])
+def get_registry():
+    """Lists the airlines and card issuers currently loaded in memory."""
+    return respond(registry.as_dict())
+
+@app.route('/api/registry/reload', methods=['POST'])
+def reload_registry():
+    """Reloads the registry after the airlines/card_issuers tables are edited."""
+    try:
+        with get_db_connection() as conn:
+            registry.load(conn)
+    except PoolTimeout:
+        return busy_response()
+    except Exception:
+        log.exception("Error reloading registry")
+        return respond({"error": "An internal error occurred"}), 500
+    flights_cache.clear()
+    seats_cache.clear()
+    return respond(registry.as_dict())
+
+# Explicit columns, in the order booking_dict() unpacks them
+BOOKING_COLUMNS = 'id, user_id, flight_id, flight_code, flight_date, seat_number, passenger_name, ticket_number, price, booking_time'
+BOOKINGS_BATCH = 500
+BOOKINGS_MAX_LIMIT = 1000
 
 @app.route('/api/users/<int:user_id>/bookings', methods=['GET'])
 def get_user_bookings(user_id):
-    print(f"Fetching bookings for user_id: {user_id}")
+    """
+    Streams a user's bookings, latest flight first, as a JSON array.
+    Optional parameters: limit, after (keyset cursor "YYYY-MM-DD:id", the flight_date and id of the last booking received)
+    Honors If-None-Match: an unchanged history returns 304 without reading the rows.
+    """
+    after = request.args.get('after')
+    try:
+        limit = int(request.args['limit']) if 'limit' in request.args else None
+        if limit is not None and not 1 <= limit <= BOOKINGS_MAX_LIMIT:
+            raise ValueError
+        if after:
+            after_date, after_id = after.split(':')
+            after_key = (datetime.strptime(after_date, '%Y-%m-%d').date(), int(after_id))
+    except ValueError:
+        return respond({"error": f"Invalid pagination parameters (limit 1-{BOOKINGS_MAX_LIMIT}, after YYYY-MM-DD:id)"}), 400
+
+    try:
+        conn = db_pool.getconn()
+    except PoolTimeout:
+        return busy_response()
+    except psycopg2.Error as e:
+        log.warning("Error fetching user bookings: %s", e)
+        return respond({"error": "An internal error occurred"}), 500
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        cursor.execute('SELECT * FROM bookings WHERE user_id = %s ORDER BY flight_date DESC', (user_id,))
-        bookings = cursor.fetchall()
+        # Bookings are only ever inserted, so the count and highest id identify a version of the history.
+        cursor = conn.cursor()
+        cursor.execute('SELECT count(*), coalesce(max(id), 0) FROM bookings WHERE user_id = %s', (user_id,))
+        count, max_id = cursor.fetchone()
         cursor.close()
-        conn.close()
-        print(f"Found {len(bookings)} bookings.")
-
-        bookings_list = []
-        for booking in bookings:
-            booking_dict = dict(booking)
-            if 'flight_date' in booking_dict and booking_dict['flight_date']:
-                booking_dict['flight_date'] = booking_dict['flight_date'].isoformat()
-            if 'booking_time' in booking_dict and booking_dict['booking_time']:
-                booking_dict['booking_time'] = booking_dict['booking_time'].isoformat()
-            bookings_list.append(booking_dict)
-
-        print(f"Returning bookings: {bookings_list}")
-        return jsonify(bookings_list)
-    except Exception as e:
-        print(f"Error fetching user bookings: {e}")
-        return jsonify({"error": "An internal error occurred"}), 500
+    except Exception:
+        db_pool.putconn(conn)
+        log.exception("Error fetching user bookings")
+        return respond({"error": "An internal error occurred"}), 500
+
+    xml = requested_format() == 'XML'
+    etag = f"{user_id}-{count}-{max_id}-{limit or ''}-{after or ''}-{'x' if xml else 'j'}"
+    if request.if_none_match.contains(etag):
+        db_pool.putconn(conn)
+        response = Response(status=304)
+    else:
+        query = f'SELECT {BOOKING_COLUMNS} FROM bookings WHERE user_id = %s'
+        params = [user_id]
+        if after:
+            query += ' AND (flight_date, id) < (%s, %s)'
+            params += after_key
+        query += ' ORDER BY flight_date DESC, id DESC'
+        if limit:
+            query += ' LIMIT %s'
+            params.append(limit)
+        response = Response(stream_bookings(conn, query, params, xml), mimetype='application/xml' if xml else 'application/json')
+        # The connection goes back to the pool once the response is closed, even if the client disconnects early
+        response.call_on_close(lambda: db_pool.putconn(conn))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Accept')
+    return response
+
+def stream_bookings(conn, query, params, xml=False):
+    """Yields the JSON array (or <boletos> document) in chunks of BOOKINGS_BATCH rows read from a server-side cursor."""
+    try:
+        cursor = conn.cursor(name='user_bookings')
+        cursor.itersize = BOOKINGS_BATCH
+        cursor.execute(query, params)
+        yield XML_DECLARATION + '<boletos>' if xml else '['
+        separator = ''
+        while True:
+            rows = cursor.fetchmany(BOOKINGS_BATCH)
+            if not rows:
+                break
+            if xml:
+                yield from iter_xml_items('boleto', map(booking_dict, rows))
+            else:
+                yield separator + ','.join(json.dumps(booking_dict(row)) for row in rows)
+                separator = ','
+        yield '</boletos>' if xml else ']'
+        cursor.close()
+    except psycopg2.Error as e:
+        # Headers are already sent; the truncated document tells the client something went wrong.
+        log.warning("Error streaming user bookings: %s", e)
+
+def booking_dict(row):
+    booking_id, user_id, flight_id, flight_code, flight_date, seat_number, passenger_name, ticket_number, price, booking_time = row
+    return {
+        "id": booking_id,
+        "user_id": user_id,
+        "flight_id": flight_id,
+        "flight_code": flight_code,
+        "flight_date": flight_date.isoformat() if flight_date else None,
+        "seat_number": seat_number,
+        "passenger_name": passenger_name,
+        "ticket_number": ticket_number,
+        "price": str(price) if price is not None else None,
+        "booking_time": booking_time.isoformat() if booking_time else None,
+    }
 
 @app.route('/api/reserva', methods=['GET'])
 def create_ticket():
@@ -178,53 +449,80 @@ def create_ticket():
     precio = request.args.get('precio')
 
     if not all([user_id, aerolinea, vuelo, fecha_str, asiento, nombre, precio]):
-        return jsonify({"error": "Missing required fields for booking"}), 400
+        return respond({"error": "Missing required fields for booking"}), 400
+
+    result = book_seats(user_id, aerolinea, vuelo, fecha_str, [asiento], nombre, precio)
+    if not isinstance(result, list):
+        return result
+    return respond({"boleto": result[0]}), 201
+
+@app.route('/api/reservas', methods=['POST'])
+def create_tickets():
+    """
+    Reserves every seat of one purchase in a single transaction.
+    Expected JSON body: aerolinea, vuelo, fecha, asientos (list), nombre, user_id, precio
+    Returns all boletos, or 409 with the list of already booked seats and nothing reserved.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return respond({"error": "Booking body must be a JSON object"}), 400
+    user_id, aerolinea, vuelo, fecha_str = data.get('user_id'), data.get('aerolinea'), data.get('vuelo'), data.get('fecha')
+    asientos, nombre, precio = data.get('asientos'), data.get('nombre'), data.get('precio')
+
+    if not all([user_id, aerolinea, vuelo, fecha_str, asientos, nombre, precio]) or not isinstance(asientos, list):
+        return respond({"error": "Missing required fields for booking"}), 400
+
+    result = book_seats(user_id, aerolinea, str(vuelo), str(fecha_str), asientos, nombre, precio)
+    if not isinstance(result, list):
+        return result
+    return respond({"boletos": result}), 201
 
+def book_seats(user_id, aerolinea, vuelo, fecha_str, asientos, nombre, precio):
+    """Claims all seats atomically; returns the list of boletos or an error response."""
+    error = validate_seats(asientos)
+    if error:
+        return respond({"error": error}), 400
     try:
-        ticket_number = str(uuid.uuid4().hex)[:10].upper()
         flight_date = datetime.strptime(fecha_str, '%Y%m%d').date()
-        flight_id = int(vuelo)
-        flight_code = f"{aerolinea}{vuelo}"
+        user_id, precio = int(user_id), float(precio)
+        int(vuelo)
+        # JSON bodies can carry lists or objects where strings are expected
+        if not isinstance(aerolinea, str) or not isinstance(nombre, str):
+            raise TypeError("aerolinea and nombre must be strings")
+    except (TypeError, ValueError):
+        return respond({"error": "Invalid booking fields"}), 400
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
+    try:
+        with get_db_connection() as conn:
+            claimed = claim_seats(conn, user_id, aerolinea, vuelo, flight_date, asientos, nombre, precio)
+    except SeatConflict as conflict:
+        # Another process sold these seats; reload the flight on the next seat map
+        seat_index.invalidate(f"{aerolinea}{vuelo}", flight_date)
+        return respond({"error": f"Seats already booked for this flight: {', '.join(conflict.seats)}", "asientos_ocupados": conflict.seats}), 409
+    except UnknownUser:
+        return respond({"error": "Unknown user_id"}), 400
+    except PoolTimeout:
+        return busy_response()
+    except psycopg2.Error as e:
+        log.warning("Database error creating booking: %s", e)
+        return respond({"error": "A database error occurred"}), 500
+    except Exception:
+        log.exception("Error creating ticket/booking")
+        return respond({"error": "An internal error occurred"}), 500
 
-        cursor.execute(
-            "SELECT id FROM bookings WHERE flight_code = %s AND flight_date = %s AND seat_number = %s;",
-            (flight_code, flight_date, asiento)
-        )
-        if cursor.fetchone():
-            conn.close()
-            return jsonify({"error": f"Seat {asiento} already booked for this flight"}), 409
-
-        cursor.execute(
-            """
-            INSERT INTO bookings (user_id, flight_id, flight_code, flight_date, seat_number, passenger_name, ticket_number, price) 
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """,
-            (int(user_id), flight_id, flight_code, flight_date, asiento, nombre, ticket_number, float(precio))
-        )
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        response = {
-            "boleto": {
-                "aerolinea": aerolinea,
-                "vuelo": vuelo,
-                "fecha": fecha_str,
-                "horra": "1400",
-                "numero": ticket_number
-            }
+    # The seat map must never offer the seats we just sold
+    seat_index.mark_booked(f"{aerolinea}{vuelo}", flight_date, asientos)
+    return [
+        {
+            "aerolinea": aerolinea,
+            "vuelo": vuelo,
+            "fecha": fecha_str,
+            "horra": "1400",
+            "numero": ticket_number,
+            "asiento": seat
         }
-        return jsonify(response), 201
-
-    except psycopg2.Error as db_err:
-        print(f"Database error creating booking: {db_err}")
-        return jsonify({"error": "A database error occurred"}), 500
-    except Exception as e:
-        print(f"Error creating ticket/booking: {e}")
-        return jsonify({"error": "An internal error occurred"}), 500
+        for seat, ticket_number in claimed
+    ]
 
 # --- 📝 MOCK PAYMENT ENDPOINT ---
 @app.route('/api/autorizacion', methods=['GET'])
@@ -239,9 +537,17 @@ def authorize_payment():
     num_seguridad = request.args.get('num_seguridad', '123')
     monto = request.args.get('monto', '600')
     tienda = request.args.get('tienda', 'MYBOOKING')
-    formato = request.args.get('formato', 'JSON')
-    
-    # Simple mock logic: A specific card number is always approved.
+
+    params = {"tarjeta": tarjeta or '', "nombre": nombre, "fecha_venc": fecha_venc, "num_seguridad": num_seguridad, "monto": monto, "tienda": tienda}
+    try:
+        autorizacion = issuer_client.authorize(params)
+    except UpstreamError as e:
+        log.warning("Error authorizing payment: %s", e)
+        return respond({"error": "The card issuer is not available"}), 502
+    if autorizacion is not None:
+        return respond({"autorizacion": autorizacion}), 200 if autorizacion.get('status') == 'APROBADO' else 402
+
+    # No issuer registered for this card: simple mock logic: A specific card number is always approved.
     if tarjeta == "4242424242424242":
         response = {
             "autorizacion": {
@@ -251,7 +557,7 @@ def authorize_payment():
                 "numero": "654321" # A mock authorization number
             }
         }
-        return jsonify(response), 200
+        return respond(response), 200
     else:
         response = {
             "autorizacion": {
@@ -261,7 +567,7 @@ def authorize_payment():
                 "numero": "0" # Authorization number is 0 if denied 
             }
         }
-        return jsonify(response), 402 # 402 Payment Required (but failed)
+        return respond(response), 402 # 402 Payment Required (but failed)
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""
+Compares serial airline queries with the concurrent fan-out in airlines.FlightSearch.
+
+Starts local stand-in airlines (one of them slow, one of them failing) and
+reports search latency for both strategies:
+
+    python benchmarks/bench_flight_search.py --airlines 8 --latency 0.08 --rounds 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from airlines import Airline, FlightSearch, Registry, UpstreamError  # noqa: E402
+from stubs import airline_server  # noqa: E402
+
+
+def serial_search(search, params):
+    vuelos = []
+    for airline in search.registry.airlines():
+        try:
+            vuelos.extend(search._query(airline, params))
+        except UpstreamError:
+            pass
+    return vuelos
+
+
+def run(label, fn, rounds):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print(f'{label:<10} p50={1000 * statistics.median(timings):8.1f}ms  '
+          f'max={1000 * timings[-1]:8.1f}ms  flights={result}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--airlines', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.08, help='Latency of the healthy airlines (s)')
+    parser.add_argument('--slow-latency', type=float, default=1.5, help='Latency of the slow airline (s)')
+    parser.add_argument('--timeout', type=float, default=0.5, help='Per-airline timeout (s)')
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--formato', default='JSON', choices=['JSON', 'XML'], help='Format requested from the airlines')
+    args = parser.parse_args()
+
+    servers = [airline_server(f'A{i}', latency=args.latency, jitter=args.latency / 4, seed=i) for i in range(args.airlines - 2)]
+    servers.append(airline_server('SL', latency=args.slow_latency))
+    servers.append(airline_server('ER', error_rate=1.0))
+    for server in servers:
+        server.start()
+
+    registry = Registry()
+    registry.replace([Airline(s.code, s.code, s.host, 'script_lista_vuelos', 'script_lista_asientos', 'script_reserva') for s in servers])
+    # A high breaker threshold keeps the failing airline in play so both strategies pay for it.
+    search = FlightSearch(registry, timeout=args.timeout, deadline=args.timeout + 0.1, breaker_threshold=10 ** 6, formato=args.formato)
+    params = {"origen": "GUA", "destino": "MIA", "fecha": "20251115"}
+
+    print(f'{args.airlines} airlines, healthy latency {1000 * args.latency:.0f}ms, '
+          f'one at {1000 * args.slow_latency:.0f}ms, one failing, timeout {1000 * args.timeout:.0f}ms')
+    run('serial', lambda: len(serial_search(search, params)), args.rounds)
+    run('fan-out', lambda: len(search.search('GUA', 'MIA', '20251115')['lista_vuelos']['vuelos']), args.rounds)
+
+    search.shutdown()
+    for server in servers:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
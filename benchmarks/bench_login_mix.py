@@ -0,0 +1,130 @@
+"""
+Flight-search latency while a login burst is in progress.
+
+Simulates the app's request workers with a thread pool and sends an open-loop
+mix of searches and logins to it.  Logins either run bcrypt inline on the
+request thread (the old behaviour) or go through hashing.PasswordHasher.
+Needs only bcrypt, no database or Flask:
+
+    python benchmarks/bench_login_mix.py --threads 16 --logins 10 --searches 100 --seconds 10
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import bcrypt  # noqa: E402
+
+from hashing import HasherBusy, PasswordHasher, _encode  # noqa: E402
+from serializers import to_json  # noqa: E402
+
+SEARCH_PAYLOAD = {"lista_vuelos": {"fecha": "20251115", "origen": "GUA", "destino": "MIA", "vuelos": [
+    {"aerolinea": "AA", "numero": str(100 + i), "hora": "0830", "precio": "380.50"} for i in range(200)
+]}}
+
+
+def search():
+    """Stand-in for a cached flight search: some GIL-bound serialization and a short wait on I/O."""
+    json.loads(to_json(SEARCH_PAYLOAD))
+    time.sleep(0.002)
+    return 200
+
+
+def inline_login(pw_hash):
+    def login():
+        return 200 if bcrypt.checkpw(_encode('password'), pw_hash) else 401
+    return login
+
+
+def pooled_login(hasher, pw_hash):
+    def login():
+        try:
+            return 200 if hasher.verify('password', pw_hash.decode('ascii'))[0] else 401
+        except HasherBusy:
+            return 429
+    return login
+
+
+def run(label, login, args):
+    workers = ThreadPoolExecutor(max_workers=args.threads)
+    results = {"search": [], "login": []}
+    statuses = {}
+    lock = threading.Lock()
+
+    def handle(kind, fn, queued):
+        try:
+            status = fn()
+        except Exception as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - queued
+        with lock:
+            results[kind].append(elapsed)
+            statuses[(kind, status)] = statuses.get((kind, status), 0) + 1
+
+    # Poisson arrivals for both request types, merged into one schedule
+    rnd = random.Random(args.seed)
+    schedule = []
+    for kind, rate in (('search', args.searches), ('login', args.logins)):
+        at = 0.0
+        while True:
+            at += rnd.expovariate(rate)
+            if at >= args.seconds:
+                break
+            schedule.append((at, kind))
+    schedule.sort()
+
+    started = time.perf_counter()
+    for at, kind in schedule:
+        delay = started + at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        workers.submit(handle, kind, search if kind == 'search' else login, time.perf_counter())
+    workers.shutdown(wait=True)
+    wall = time.perf_counter() - started
+
+    print(label)
+    for kind in ('search', 'login'):
+        timings = sorted(results[kind])
+        if not timings:
+            continue
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        codes = ' '.join(f'{status}:{count}' for (k, status), count in sorted(statuses.items(), key=str) if k == kind)
+        print(f'  {kind:<7} n={len(timings):5d}  p50={1000 * statistics.median(timings):8.1f}ms  '
+              f'p99={1000 * p99:8.1f}ms  max={1000 * timings[-1]:8.1f}ms  [{codes}]')
+    print(f'  wall {wall:.1f}s for {args.seconds:.0f}s of arrivals')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=16, help='Request worker threads')
+    parser.add_argument('--searches', type=float, default=100, help='Search arrivals per second')
+    parser.add_argument('--logins', type=float, default=10, help='Login arrivals per second')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--rounds', type=int, default=12, help='bcrypt cost')
+    parser.add_argument('--workers', type=int, default=None, help='Hashing processes (default: cores - 1)')
+    parser.add_argument('--max-pending', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    pw_hash = bcrypt.hashpw(b'password', bcrypt.gensalt(args.rounds))
+    hasher = PasswordHasher(rounds=args.rounds, workers=args.workers, max_pending=args.max_pending)
+    hasher.start()
+    print(f'{os.cpu_count()} cores, {args.threads} request threads, cost {args.rounds}, '
+          f'{args.searches:.0f} searches/s + {args.logins:.0f} logins/s for {args.seconds:.0f}s')
+
+    run('baseline: searches only', inline_login(pw_hash), argparse.Namespace(**{**vars(args), 'logins': 1e-9}))
+    run('bcrypt inline on request threads', inline_login(pw_hash), args)
+    run(f'PasswordHasher ({hasher.workers} workers, max_pending {hasher.max_pending})', pooled_login(hasher, pw_hash), args)
+    print(f'  hasher {hasher.stats()}')
+    hasher.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Overhead of the instrumentation in metrics.py.
+
+Times a bare Histogram.observe, a trivial Flask route with and without
+``instrument``, rendering /metrics, and, if the Postgres in .env is
+reachable, ``SELECT 1`` through a plain and a timed connection.
+
+    python benchmarks/bench_metrics.py --requests 20000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import psycopg2  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+from flask import Flask  # noqa: E402
+
+from metrics import REGISTRY, TimedConnection, instrument  # noqa: E402
+
+
+def per_call(fn, n):
+    fn()
+    started = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - started) / n
+
+
+def flask_app(instrumented):
+    app = Flask(f'bench_{instrumented}')
+    if instrumented:
+        instrument(app)
+
+    @app.route('/ping')
+    def ping():
+        return 'pong'
+
+    client = app.test_client()
+    return lambda: client.get('/ping').close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--observations', type=int, default=500000)
+    parser.add_argument('--queries', type=int, default=5000)
+    args = parser.parse_args()
+    load_dotenv()
+    # Measures the instrumentation, not log output
+    logging.getLogger('trivago').setLevel(logging.WARNING)
+
+    histogram = REGISTRY.histogram('bench_seconds', 'Benchmark only', ('route',))
+    print(f'Histogram.observe:          {1e9 * per_call(lambda: histogram.observe(0.0123, "/api/flights"), args.observations):8.0f} ns')
+
+    plain = per_call(flask_app(False), args.requests)
+    timed = per_call(flask_app(True), args.requests)
+    print(f'Flask request, plain:       {1e6 * plain:8.1f} us')
+    print(f'Flask request, instrumented:{1e6 * timed:8.1f} us  (+{1e6 * (timed - plain):.1f} us)')
+    print(f'render /metrics:            {1e3 * per_call(REGISTRY.render, 200):8.2f} ms')
+
+    params = dict(host=os.getenv("DB_HOST"), database=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASSWORD"), port=os.getenv("DB_PORT"))
+    try:
+        conns = [psycopg2.connect(**params), psycopg2.connect(connection_factory=TimedConnection, **params)]
+    except psycopg2.OperationalError as e:
+        print(f'SELECT 1: skipped ({e.__class__.__name__}: no database)')
+        return
+    for label, conn in zip(('plain', 'timed'), conns):
+        cursor = conn.cursor()
+        print(f'SELECT 1, {label} cursor:     {1e6 * per_call(lambda: cursor.execute("SELECT 1"), args.queries):8.1f} us')
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
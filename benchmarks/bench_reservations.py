@@ -0,0 +1,149 @@
+"""
+Concurrency benchmark for seat reservations against the local Postgres in .env.
+
+Many threads buy random groups of seats on the same few flights, first with the
+legacy flow (a new connection per seat, SELECT then INSERT) and then with the
+batch claim from bookings.py over the connection pool.  For each mode it reports
+purchases/s, conflicts, purchases left half-booked, and how many seats were sold
+twice.  schema.sql's unique index stops the second sale at INSERT time, so for
+the legacy flow that figure counts the INSERTs where the SELECT had found the
+seat free and only the index refused it.  Requires schema.sql to have been applied.
+
+    python benchmarks/bench_reservations.py --threads 32 --duration 10 --group 3
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import psycopg2  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+
+from bookings import SeatConflict, claim_seats, new_ticket_number  # noqa: E402
+from db import pool_from_env  # noqa: E402
+
+SEATS = [f'{fila}{pos}' for fila in range(1, 21) for pos in 'ABCD']
+BENCH_AIRLINE = 'ZZ'
+BENCH_EMAIL = 'bench-reservations@example.invalid'
+
+
+def connect():
+    return psycopg2.connect(host=os.getenv("DB_HOST"), database=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASSWORD"), port=os.getenv("DB_PORT"))
+
+
+def legacy_purchase(user_id, vuelo, flight_date, seats):
+    """The pre-batch flow: one connection and a SELECT-then-INSERT per seat.  Returns (booked, double sales)."""
+    booked = double_sold = 0
+    for seat in seats:
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id FROM bookings WHERE flight_code = %s AND flight_date = %s AND seat_number = %s;',
+                           (f'{BENCH_AIRLINE}{vuelo}', flight_date, seat))
+            if cursor.fetchone():
+                continue
+            cursor.execute(
+                'INSERT INTO bookings (user_id, flight_id, flight_code, flight_date, seat_number, passenger_name, ticket_number, price) '
+                'VALUES (%s, %s, %s, %s, %s, %s, %s, %s)',
+                (user_id, vuelo, f'{BENCH_AIRLINE}{vuelo}', flight_date, seat, 'BENCH', new_ticket_number(), 100.0))
+            conn.commit()
+            booked += 1
+        except psycopg2.IntegrityError:
+            # Both buyers passed the SELECT; only the unique index stops the double sale.
+            conn.rollback()
+            double_sold += 1
+        finally:
+            conn.close()
+    return booked, double_sold
+
+
+def batch_purchase(pool, user_id, vuelo, flight_date, seats):
+    try:
+        with pool.connection() as conn:
+            claim_seats(conn, user_id, BENCH_AIRLINE, str(vuelo), flight_date, seats, 'BENCH', 100.0)
+        return len(seats), 0
+    except SeatConflict:
+        return 0, 0
+
+
+def run(label, purchase, user_id, args):
+    first_date = date(2099, 1, 1)
+    flights = list(range(100, 100 + args.flights))
+    # Move on to a fresh flight date roughly when the current one should be sold out.
+    purchases_per_date = len(SEATS) // args.group * args.flights
+    stop = time.monotonic() + args.duration
+    lock = threading.Lock()
+    totals = {"attempts": 0, "complete": 0, "conflicts": 0, "partial": 0, "double_sold": 0}
+
+    def worker(seed):
+        rnd = random.Random(seed)
+        while time.monotonic() < stop:
+            seats = rnd.sample(SEATS, args.group)
+            flight_date = first_date + timedelta(days=totals["attempts"] // purchases_per_date)
+            booked, double_sold = purchase(user_id, rnd.choice(flights), flight_date, seats)
+            with lock:
+                totals["attempts"] += 1
+                totals["double_sold"] += double_sold
+                if booked == len(seats):
+                    totals["complete"] += 1
+                elif booked == 0:
+                    totals["conflicts"] += 1
+                else:
+                    totals["partial"] += 1
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute('SELECT count(*) FROM (SELECT 1 FROM bookings WHERE flight_code LIKE %s '
+                   'GROUP BY flight_code, flight_date, seat_number HAVING count(*) > 1) AS dup', (BENCH_AIRLINE + '%',))
+    double_sold = cursor.fetchone()[0] + totals["double_sold"]
+    cursor.execute('DELETE FROM bookings WHERE flight_code LIKE %s', (BENCH_AIRLINE + '%',))
+    conn.commit()
+    conn.close()
+
+    print(f'{label:<7} {totals["attempts"] / elapsed:8.1f} purchases/s  complete={totals["complete"]:<6} '
+          f'conflicts={totals["conflicts"]:<6} half-booked={totals["partial"]:<6} double-sold seats={double_sold}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per mode')
+    parser.add_argument('--group', type=int, default=3, help='Seats per purchase')
+    parser.add_argument('--flights', type=int, default=4, help='Distinct flights being hammered')
+    args = parser.parse_args()
+    load_dotenv()
+
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM bookings WHERE flight_code LIKE %s', (BENCH_AIRLINE + '%',))
+    cursor.execute("INSERT INTO users (full_name, email, password_hash) VALUES ('Bench', %s, '-') "
+                   "ON CONFLICT (email) DO UPDATE SET full_name = EXCLUDED.full_name RETURNING id", (BENCH_EMAIL,))
+    user_id = cursor.fetchone()[0]
+    conn.commit()
+
+    print(f'{args.threads} threads, {args.group} seats per purchase, {args.flights} flights, {args.duration:.0f}s per mode')
+    run('legacy', legacy_purchase, user_id, args)
+    pool = pool_from_env()
+    run('batch', lambda *a: batch_purchase(pool, *a), user_id, args)
+    pool.closeall()
+
+    cursor.execute('DELETE FROM users WHERE email = %s', (BENCH_EMAIL,))
+    conn.commit()
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
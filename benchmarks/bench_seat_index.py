@@ -0,0 +1,103 @@
+"""
+Micro-benchmark: seat availability from the bitmap index vs diffing booking rows.
+
+Generates synthetic bookings for thousands of flight-dates and times, per
+flight-date, the available-seat list and the "N adjacent free seats" group
+query with both approaches.  Needs no database.
+
+    python benchmarks/bench_seat_index.py --flights 5000 --occupancy 0.6
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from seat_index import FULL_MASK, POSITIONS, ROWS, SEAT_CODES, SeatIndex, has_free_block, seats_from_mask  # noqa: E402
+
+
+def make_bookings(flights, occupancy, seed):
+    rnd = random.Random(seed)
+    rows = []
+    keys = []
+    for i in range(flights):
+        key = (f'GU{100 + i % 900}', date(2030, 1, 1) + timedelta(days=i // 900))
+        keys.append(key)
+        sold = min(len(SEAT_CODES), int(len(SEAT_CODES) * rnd.uniform(0, 2 * occupancy)))
+        for seat in rnd.sample(SEAT_CODES, sold):
+            rows.append((key[0], key[1], seat))
+    return keys, rows
+
+
+# --- ROW-DIFF BASELINE ---
+def row_diff_available(booking_rows):
+    """What a straightforward implementation does per request: diff the rows against the layout."""
+    booked = {row[2] for row in booking_rows}
+    return [{"fila": str(fila), "posicion": pos} for fila in range(1, ROWS + 1) for pos in POSITIONS if f'{fila}{pos}' not in booked]
+
+
+def row_diff_has_block(booking_rows, n):
+    booked = {row[2] for row in booking_rows}
+    for fila in range(1, ROWS + 1):
+        run = 0
+        for pos in POSITIONS:
+            run = 0 if f'{fila}{pos}' in booked else run + 1
+            if run >= n:
+                return True
+    return False
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--flights', type=int, default=5000, help='Number of flight-dates')
+    parser.add_argument('--occupancy', type=float, default=0.6, help='Average fraction of seats sold')
+    parser.add_argument('--group', type=int, default=3, help='Adjacent seats for the group query')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    keys, rows = make_bookings(args.flights, args.occupancy, args.seed)
+    by_flight = {}
+    for row in rows:
+        by_flight.setdefault((row[0], row[1]), []).append(row)
+    print(f'{len(keys)} flight-dates, {len(rows)} booking rows')
+
+    index = SeatIndex(max_age=0)
+    build, _ = timed(lambda: index.load_rows(rows))
+    # Every seat of the layout is offered, as if each flight's seat map had been fetched.  Flights
+    # without bookings only get a booked mask once their seat map is served, so only booked ones count here.
+    for flight_code, flight_date in by_flight:
+        index.set_offered(flight_code, flight_date, FULL_MASK)
+    print(f'index build (one bulk pass):      {1000 * build:8.1f} ms')
+
+    diff_time, diff_result = timed(lambda: [row_diff_available(by_flight.get(k, ())) for k in keys])
+    masks = index._booked
+    bitmap_time, bitmap_result = timed(lambda: [seats_from_mask(FULL_MASK & ~masks.get(k, 0)) for k in keys])
+    assert diff_result == bitmap_result
+    print(f'available seats, row diff:        {1e6 * diff_time / len(keys):8.2f} us/flight')
+    print(f'available seats, bitmap:          {1e6 * bitmap_time / len(keys):8.2f} us/flight  ({diff_time / bitmap_time:.1f}x)')
+
+    diff_time, diff_result = timed(lambda: [k for k in by_flight if row_diff_has_block(by_flight[k], args.group)])
+    bitmap_time, bitmap_result = timed(lambda: index.flights_with_free_block(args.group))
+    assert sorted(diff_result) == sorted(bitmap_result)
+    print(f'>= {args.group} adjacent free, row diff:   {1000 * diff_time:8.2f} ms for all flights')
+    print(f'>= {args.group} adjacent free, bitmap:     {1000 * bitmap_time:8.2f} ms for all flights  ({diff_time / bitmap_time:.1f}x)'
+          f'  -> {len(bitmap_result)} flights')
+
+    row_bytes = sum(sys.getsizeof(r) + sum(sys.getsizeof(v) for v in r) for r in rows)
+    mask_bytes = sum(sys.getsizeof(m) for m in masks.values())
+    print(f'memory, booking rows:             {row_bytes / 1024:8.0f} KiB')
+    print(f'memory, bitmaps:                  {mask_bytes / 1024:8.0f} KiB')
+    assert all(has_free_block(FULL_MASK, n) for n in range(1, len(POSITIONS) + 1))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Serialize and parse throughput for large `lista_vuelos` documents.
+
+Compares the template-based XML writer and the incremental parser in
+serializers.py with building/reading a full ElementTree, and with JSON.
+
+    python benchmarks/bench_serializers.py --flights 100000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from serializers import iter_xml, parse_document, to_json  # noqa: E402
+
+
+def make_payload(flights):
+    return {"lista_vuelos": {
+        "fecha": "20251115", "origen": "GUA", "destino": "MIA",
+        "vuelos": [
+            {"aerolinea": ("AA", "GU", "TA", "CM")[i % 4], "numero": str(100 + i % 900), "hora": f"{i % 24:02d}{i % 60:02d}", "precio": f"{200 + i % 500}.50"}
+            for i in range(flights)
+        ],
+        "parcial": False,
+        "aerolineas_sin_respuesta": [],
+    }}
+
+
+# --- DOM BASELINES ---
+def dom_xml(payload):
+    lista = payload["lista_vuelos"]
+    root = ET.Element('lista_vuelos')
+    for key in ('fecha', 'origen', 'destino'):
+        ET.SubElement(root, key).text = lista[key]
+    for vuelo in lista["vuelos"]:
+        node = ET.SubElement(root, 'vuelo')
+        for key, value in vuelo.items():
+            ET.SubElement(node, key).text = value
+    return ET.tostring(root, encoding='unicode')
+
+
+def dom_parse(data):
+    root = ET.fromstring(data)
+    return {root.tag: {"vuelos": [{child.tag: child.text for child in vuelo} for vuelo in root.iter('vuelo')]}}
+
+
+def measure(label, fn, size, items, rounds):
+    best = float('inf')
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label:<26} {items / best / 1000:9.0f}k items/s  {size / best / 2 ** 20:7.1f} MiB/s  peak {peak / 2 ** 20:7.1f} MiB')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--flights', type=int, default=100000)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    payload = make_payload(args.flights)
+    json_doc = to_json(payload).encode('utf-8')
+    xml_doc = ''.join(iter_xml(payload)).encode('utf-8')
+    n = args.flights
+    print(f'{n} flights: JSON {len(json_doc) / 2 ** 20:.1f} MiB, XML {len(xml_doc) / 2 ** 20:.1f} MiB')
+
+    print('serialize')
+    measure('  json.dumps', lambda: to_json(payload), len(json_doc), n, args.rounds)
+    measure('  XML templates (streamed)', lambda: sum(map(len, iter_xml(payload))), len(xml_doc), n, args.rounds)
+    measure('  XML ElementTree DOM', lambda: dom_xml(payload), len(xml_doc), n, args.rounds)
+
+    print('parse')
+    measure('  json.load', lambda: parse_document(io.BytesIO(json_doc), 'application/json'), len(json_doc), n, args.rounds)
+    measure('  XML iterparse', lambda: parse_document(io.BytesIO(xml_doc), 'application/xml'), len(xml_doc), n, args.rounds)
+    measure('  XML ElementTree DOM', lambda: dom_parse(xml_doc), len(xml_doc), n, args.rounds)
+
+    assert parse_document(io.BytesIO(xml_doc), 'application/xml')["lista_vuelos"]["vuelos"] == payload["lista_vuelos"]["vuelos"]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,561 @@
+"""
+End-to-end load test of the booking funnel.
+
+Each virtual user repeats the session the frontend runs (js/main.js,
+js/seats.js, js/payment.js): login -> /api/flights -> /api/seats ->
+/api/autorizacion -> /api/reservas, back to back, over its own keep-alive
+connection.  The suite
+
+- starts stand-in airlines and a card issuer (benchmarks/stubs.py) with the
+  given latency and error rates, and registers them in the database from .env
+  in place of the active airlines and issuers (restored afterwards);
+- starts the app on a free port, or drives one already running (--app-url);
+- creates one user per virtual user and removes them and their bookings at the end;
+- samples pg_stat_activity and the pool gauges from /metrics while it runs.
+
+It reports throughput, per-step p50/p99 and error rates, reservation
+conflicts and DB connection counts, writes them as JSON, and with --baseline
+compares them with an earlier run (exit status 1 on a regression):
+
+    python benchmarks/load_funnel.py --concurrency 16 --duration 30 --latency 0.05 --error-rate 0.01
+    python benchmarks/load_funnel.py --concurrency 16 --duration 30 --baseline benchmarks/results/funnel-20261018-120000.json
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import psycopg2  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+
+from stubs import airline_server, issuer_server  # noqa: E402
+
+STEPS = ('login', 'flights', 'seats', 'autorizacion', 'reservas')
+ROUTES = (('GUA', 'MIA'), ('GUA', 'MEX'), ('MIA', 'JFK'), ('MEX', 'GUA'))
+FIRST_DATE = date(2099, 1, 1)
+USER_EMAIL = 'load-{}@bench.invalid'
+USER_PASSWORD = 'bench-password'
+CARD = '4111111111111111'
+
+# Metrics compared against a baseline: (path in the results, True if higher is better)
+COMPARED = [('throughput.sessions_per_s', True), ('throughput.requests_per_s', True)] + [
+    (f'steps.{step}.{field}', False) for step in STEPS for field in ('p50_ms', 'p99_ms', 'error_rate')
+]
+
+
+def connect():
+    return psycopg2.connect(host=os.getenv("DB_HOST"), database=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASSWORD"), port=os.getenv("DB_PORT"))
+
+
+# --- HTTP ---
+class Session:
+    """One virtual user's keep-alive connection to the app."""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.netloc = parts.netloc
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path, params=None, body=None):
+        """
+        Returns (status, decoded JSON or None, Retry-After seconds or None);
+        raises OSError/HTTPException if the app cannot be reached.
+        """
+        if params:
+            path += '?' + urlencode(params)
+        headers = {'Accept': 'application/json'}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.netloc, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, data, headers)
+                response = self.conn.getresponse()
+                payload = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.close()
+                # The server may have closed an idle keep-alive connection
+                if attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                self.close()
+                raise
+            if response.will_close:
+                self.close()
+            retry_after = response.getheader('Retry-After')
+            retry_after = float(retry_after) if retry_after and retry_after.isdigit() else None
+            try:
+                return response.status, json.loads(payload) if payload else None, retry_after
+            except ValueError:
+                return response.status, None, retry_after
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+# --- FUNNEL ---
+class Recorder:
+    def __init__(self, record_after, retries=5):
+        self.record_after = record_after
+        # Requests shed with 429/503 and a Retry-After are retried like a browser would, up to this many times
+        self.retries = retries
+        self.lock = threading.Lock()
+        self.latencies = {step: [] for step in STEPS}
+        self.statuses = {step: {} for step in STEPS}
+        self.outcomes = {}
+
+    def step(self, session, step, method, path, **kwargs):
+        """Runs one funnel step; its latency includes any Retry-After waits, its statuses every attempt."""
+        started = time.perf_counter()
+        attempts = []
+        while True:
+            try:
+                status, payload, retry_after = session.request(method, path, **kwargs)
+            except (OSError, http.client.HTTPException) as e:
+                status, payload, retry_after = type(e).__name__, None, None
+            attempts.append(status)
+            if status not in (429, 503) or retry_after is None or len(attempts) > self.retries:
+                break
+            time.sleep(retry_after)
+        elapsed = time.perf_counter() - started
+        if time.monotonic() >= self.record_after:
+            with self.lock:
+                self.latencies[step].append(elapsed)
+                for attempt in attempts:
+                    self.statuses[step][attempt] = self.statuses[step].get(attempt, 0) + 1
+        return status, payload
+
+    def outcome(self, name):
+        if time.monotonic() >= self.record_after:
+            with self.lock:
+                self.outcomes[name] = self.outcomes.get(name, 0) + 1
+
+
+def run_session(session, recorder, rnd, email, args):
+    """One pass through the funnel; returns the outcome name."""
+    status, payload = recorder.step(session, 'login', 'POST', '/api/login', body={"email": email, "password": USER_PASSWORD})
+    if status != 200:
+        return 'login_failed'
+    user = payload['user']
+
+    for _ in range(3):
+        origen, destino = rnd.choice(ROUTES)
+        fecha = (FIRST_DATE + timedelta(days=rnd.randrange(args.dates))).strftime('%Y%m%d')
+        status, payload = recorder.step(session, 'flights', 'GET', '/api/flights',
+                                        params={"origen": origen, "destino": destino, "fecha": fecha, "formato": "JSON"})
+        vuelos = (payload or {}).get('lista_vuelos', {}).get('vuelos') if status == 200 else None
+        if not vuelos:
+            return 'no_flights'
+        flight = rnd.choice(vuelos)
+
+        status, payload = recorder.step(session, 'seats', 'GET', '/api/seats', params={
+            "aerolinea": flight['aerolinea'], "vuelo": flight['numero'], "fecha": fecha, "formato": "JSON"})
+        if status != 200:
+            return 'seats_failed'
+        asientos = payload['lista_asientos']['asientos']
+        if len(asientos) >= args.group:
+            break
+    else:
+        return 'sold_out'
+    seats = [a['fila'] + a['posicion'] for a in rnd.sample(asientos, args.group)]
+    amount = f"{float(flight['precio']) * args.group:.2f}"
+
+    status, payload = recorder.step(session, 'autorizacion', 'GET', '/api/autorizacion', params={
+        "tarjeta": CARD, "nombre": user['full_name'], "fecha_venc": "1230", "num_seguridad": "123",
+        "monto": amount, "tienda": "TRIVAGO", "formato": "JSON"})
+    if status == 402:
+        return 'denied'
+    if status != 200:
+        return 'authorization_failed'
+
+    status, payload = recorder.step(session, 'reservas', 'POST', '/api/reservas', body={
+        "user_id": user['id'], "aerolinea": flight['aerolinea'], "vuelo": flight['numero'], "fecha": fecha,
+        "asientos": seats, "nombre": user['full_name'].replace(' ', ''), "precio": flight['precio']})
+    if status == 201:
+        return 'booked'
+    if status == 409:
+        return 'conflict'
+    return 'reservation_failed'
+
+
+# --- MONITORING ---
+class Monitor(threading.Thread):
+    """Samples DB connections from pg_stat_activity and the pool gauges from /metrics."""
+
+    def __init__(self, base_url, interval=0.5):
+        super().__init__(daemon=True)
+        self.session = Session(base_url, timeout=5)
+        self.interval = interval
+        self.stop = threading.Event()
+        self.pg_samples = []
+        self.pool_samples = []
+
+    def run(self):
+        conn = connect()
+        conn.autocommit = True
+        cursor = conn.cursor()
+        while not self.stop.wait(self.interval):
+            cursor.execute('SELECT count(*), count(*) FILTER (WHERE state = %s) FROM pg_stat_activity '
+                           'WHERE datname = current_database() AND pid <> pg_backend_pid()', ('active',))
+            self.pg_samples.append(cursor.fetchone())
+            try:
+                self.pool_samples.append(scrape_pool(self.session))
+            except (OSError, http.client.HTTPException):
+                pass
+        conn.close()
+        self.session.close()
+
+    def summary(self):
+        total = [s[0] for s in self.pg_samples] or [0]
+        active = [s[1] for s in self.pg_samples] or [0]
+        pool = self.pool_samples[-1] if self.pool_samples else {}
+        return {
+            "pg_connections_max": max(total),
+            "pg_connections_avg": round(sum(total) / len(total), 1),
+            "pg_active_max": max(active),
+            "pool_in_use_max": max((s.get('db_pool_in_use', 0) for s in self.pool_samples), default=None),
+            "pool_waiters_max": max((s.get('db_pool_waiters', 0) for s in self.pool_samples), default=None),
+            "pool": {k[len('db_pool_'):]: v for k, v in pool.items()},
+        }
+
+
+def scrape_pool(session):
+    """The db_pool_* samples from the app's /metrics."""
+    conn = http.client.HTTPConnection(session.netloc, timeout=session.timeout)
+    try:
+        conn.request('GET', '/metrics')
+        text = conn.getresponse().read().decode('utf-8')
+    finally:
+        conn.close()
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith('db_pool_'):
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+    return samples
+
+
+# --- SETUP ---
+class Environment:
+    """Stand-in sites registered in the database, the app process and the bench users."""
+
+    def __init__(self, args):
+        self.args = args
+        self.servers = []
+        self.saved = None
+        self.app = None
+        self.app_log = None
+        self.base_url = args.app_url
+
+    def __enter__(self):
+        args = self.args
+        options = dict(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+        # __exit__ does not run when __enter__ fails, and the registry may already be swapped
+        try:
+            for i in range(args.airlines):
+                self.servers.append(airline_server(f'Z{chr(65 + i)}', seed=i, **options).start())
+            self.servers.append(issuer_server('BENCHVISA', deny_rate=args.deny_rate, seed=99, **options).start())
+            self._register()
+            if self.base_url is None:
+                self._start_app()
+            else:
+                self._wait_for_app()
+                Session(self.base_url, 10).request('POST', '/api/registry/reload')
+            self._create_users()
+        except BaseException:
+            self.__exit__(*sys.exc_info())
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            # Nothing was changed in the database unless _register got as far as reading the registry
+            if self.saved is not None:
+                conn = connect()
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM bookings WHERE user_id IN (SELECT id FROM users WHERE email LIKE %s)', (USER_EMAIL.format('%'),))
+                cursor.execute('DELETE FROM users WHERE email LIKE %s', (USER_EMAIL.format('%'),))
+                conn.commit()
+                conn.close()
+                self._unregister()
+        finally:
+            if self.app is not None:
+                self.app.terminate()
+                try:
+                    self.app.wait(10)
+                except subprocess.TimeoutExpired:
+                    self.app.kill()
+                    self.app.wait()
+            elif self.args.app_url and self.saved is not None:
+                try:
+                    Session(self.base_url, 10).request('POST', '/api/registry/reload')
+                except (OSError, http.client.HTTPException) as e:
+                    print(f'could not reload the registry of {self.base_url}: {e}', file=sys.stderr)
+            for server in self.servers:
+                server.stop()
+
+    def _register(self):
+        conn = connect()
+        cursor = conn.cursor()
+        cursor.execute('SELECT code FROM airlines WHERE active')
+        airlines = [row[0] for row in cursor.fetchall()]
+        cursor.execute('SELECT code FROM card_issuers WHERE active')
+        issuers = [row[0] for row in cursor.fetchall()]
+        self.saved = (airlines, issuers)
+        cursor.execute('UPDATE airlines SET active = FALSE')
+        cursor.execute('UPDATE card_issuers SET active = FALSE')
+        for server in self.servers[:-1]:
+            cursor.execute('INSERT INTO airlines (code, name, host) VALUES (%s, %s, %s) '
+                           'ON CONFLICT (code) DO UPDATE SET host = EXCLUDED.host, active = TRUE',
+                           (server.code, f'Bench {server.code}', server.host))
+        issuer = self.servers[-1]
+        cursor.execute("INSERT INTO card_issuers (code, name, host, card_prefix) VALUES (%s, 'Bench issuer', %s, '4') "
+                       "ON CONFLICT (code) DO UPDATE SET host = EXCLUDED.host, active = TRUE", (issuer.code, issuer.host))
+        cursor.execute('DELETE FROM bookings WHERE flight_date >= %s AND flight_code LIKE %s', (FIRST_DATE, 'Z%'))
+        conn.commit()
+        conn.close()
+
+    def _unregister(self):
+        airlines, issuers = self.saved
+        conn = connect()
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM airlines WHERE code = ANY(%s)', ([s.code for s in self.servers[:-1]],))
+        cursor.execute('DELETE FROM card_issuers WHERE code = %s', (self.servers[-1].code,))
+        cursor.execute('UPDATE airlines SET active = TRUE WHERE code = ANY(%s)', (airlines,))
+        cursor.execute('UPDATE card_issuers SET active = TRUE WHERE code = ANY(%s)', (issuers,))
+        conn.commit()
+        conn.close()
+
+    def _start_app(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        self.base_url = f'http://127.0.0.1:{port}'
+        self.app_log = tempfile.NamedTemporaryFile(prefix='load-funnel-app-', suffix='.log', delete=False)
+        env = dict(os.environ, **self.args.app_env)
+        code = ('from werkzeug.serving import run_simple\n'
+                'from app import app\n'
+                f'run_simple("127.0.0.1", {port}, app, threaded=True)\n')
+        self.app = subprocess.Popen([sys.executable, '-c', code], cwd=ROOT, env=env, stdout=self.app_log, stderr=subprocess.STDOUT)
+        self._wait_for_app()
+
+    def _wait_for_app(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.app is not None and self.app.poll() is not None:
+                raise SystemExit(f'The app exited with status {self.app.returncode}; see {self.app_log.name}')
+            try:
+                status = Session(self.base_url, 2).request('GET', '/api/registry')[0]
+                if status == 200:
+                    return
+            except (OSError, http.client.HTTPException):
+                pass
+            if time.monotonic() > deadline:
+                raise SystemExit(f'The app did not answer on {self.base_url} within {timeout}s')
+            time.sleep(0.2)
+
+    def _create_users(self):
+        session = Session(self.base_url, 60)
+        for i in range(self.args.concurrency):
+            status, payload, _ = session.request('POST', '/api/register', body={
+                "full_name": f"Load Tester {i}", "email": USER_EMAIL.format(i), "password": USER_PASSWORD})
+            if status not in (201, 409):
+                raise SystemExit(f'Could not create bench user {i}: HTTP {status} {payload}')
+        session.close()
+
+
+# --- REPORTING ---
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def summarize(recorder, elapsed, monitor, args):
+    steps = {}
+    requests = 0
+    for step in STEPS:
+        timings = sorted(recorder.latencies[step])
+        statuses = recorder.statuses[step]
+        count = len(timings)
+        requests += count
+        errors = sum(n for status, n in statuses.items() if not isinstance(status, int) or status >= 500)
+        steps[step] = {
+            "count": count,
+            "p50_ms": round(1000 * percentile(timings, 0.5), 2) if timings else None,
+            "p99_ms": round(1000 * percentile(timings, 0.99), 2) if timings else None,
+            "errors": errors,
+            "error_rate": round(errors / count, 4) if count else 0.0,
+            "statuses": {str(status): n for status, n in sorted(statuses.items(), key=str)},
+        }
+    outcomes = recorder.outcomes
+    sessions = sum(outcomes.values())
+    reservations = steps['reservas']['count']
+    return {
+        "run": {
+            "started_at": datetime.now().isoformat(timespec='seconds'),
+            "commit": git_commit(),
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "group": args.group,
+            "airlines": args.airlines,
+            "latency_s": args.latency,
+            "error_rate": args.error_rate,
+            "deny_rate": args.deny_rate,
+        },
+        "throughput": {
+            "sessions_per_s": round(sessions / elapsed, 2),
+            "bookings_per_s": round(outcomes.get('booked', 0) / elapsed, 2),
+            "requests_per_s": round(requests / elapsed, 2),
+        },
+        "steps": steps,
+        "outcomes": dict(sorted(outcomes.items())),
+        "conflict_rate": round(outcomes.get('conflict', 0) / reservations, 4) if reservations else 0.0,
+        "db": monitor.summary(),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results):
+    throughput, db = results["throughput"], results["db"]
+    print(f'sessions/s {throughput["sessions_per_s"]}  bookings/s {throughput["bookings_per_s"]}  requests/s {throughput["requests_per_s"]}')
+    print(f'{"step":<14}{"count":>8}{"p50 ms":>10}{"p99 ms":>10}{"errors":>9}  statuses')
+    for step, s in results["steps"].items():
+        p50 = '-' if s["p50_ms"] is None else f'{s["p50_ms"]:.1f}'
+        p99 = '-' if s["p99_ms"] is None else f'{s["p99_ms"]:.1f}'
+        statuses = ' '.join(f'{k}:{v}' for k, v in s["statuses"].items())
+        print(f'{step:<14}{s["count"]:>8}{p50:>10}{p99:>10}{100 * s["error_rate"]:>8.1f}%  {statuses}')
+    print('outcomes   ' + '  '.join(f'{k}={v}' for k, v in results["outcomes"].items()) + f'  conflict rate {100 * results["conflict_rate"]:.1f}%')
+    print(f'postgres   connections max {db["pg_connections_max"]} avg {db["pg_connections_avg"]} active max {db["pg_active_max"]}')
+    pool = db["pool"]
+    if pool:
+        print(f'pool       size {pool.get("size"):.0f}/{pool.get("max_size"):.0f}  in use max {db["pool_in_use_max"]:.0f}  '
+              f'waiters max {db["pool_waiters_max"]:.0f}  timeouts {pool.get("timeouts_total"):.0f}  '
+              f'checkout wait avg {pool.get("checkout_wait_avg_ms")} ms max {pool.get("checkout_wait_max_ms")} ms')
+
+
+def lookup(results, path):
+    value = results
+    for key in path.split('.'):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def compare(results, baseline, tolerance, min_ms):
+    """Prints the change of every COMPARED metric; returns the regressions beyond ``tolerance``."""
+    regressions = []
+    print(f'\nagainst baseline {baseline["run"].get("started_at")} (commit {baseline["run"].get("commit")}), tolerance {100 * tolerance:.0f}%')
+    for path, higher_is_better in COMPARED:
+        old, new = lookup(baseline, path), lookup(results, path)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old if old else (0.0 if new == old else float('inf'))
+        worse = -change if higher_is_better else change
+        # Error rates are compared in absolute points, as the baseline is often 0
+        if path.endswith('error_rate'):
+            worse = (old - new) if higher_is_better else (new - old)
+        # Sub-millisecond moves of a fast step are noise, whatever their percentage
+        if path.endswith('_ms') and new - old < min_ms:
+            worse = 0.0
+        flag = 'REGRESSION' if worse > tolerance else ''
+        if flag:
+            regressions.append(path)
+        print(f'  {path:<32}{old:>12}{new:>12}{100 * change:>+9.1f}%  {flag}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=8, help='Virtual users running sessions back to back')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds measured, after --warmup')
+    parser.add_argument('--warmup', type=float, default=3, help='Seconds run before measuring')
+    parser.add_argument('--group', type=int, default=2, help='Seats bought per session')
+    parser.add_argument('--dates', type=int, default=7, help='Distinct flight dates; fewer means more seat contention')
+    parser.add_argument('--airlines', type=int, default=3, help='Stand-in airlines')
+    parser.add_argument('--latency', type=float, default=0.02, help='Stand-in site latency (s)')
+    parser.add_argument('--jitter', type=float, default=0.01, help='Random +/- seconds around --latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of stand-in site requests answered with HTTP 500')
+    parser.add_argument('--deny-rate', type=float, default=0.0, help='Fraction of card authorizations denied')
+    parser.add_argument('--timeout', type=float, default=30, help='Client timeout per request (s)')
+    parser.add_argument('--retries', type=int, default=5, help='Retries of a request shed with 429/503 and Retry-After')
+    parser.add_argument('--app-url', help='Drive an app that is already running instead of starting one')
+    parser.add_argument('--app-env', action='append', default=[], metavar='NAME=VALUE',
+                        help='Environment for the app started by the suite, e.g. --app-env DB_POOL_MAX=20')
+    parser.add_argument('--output', help='Results file (default benchmarks/results/funnel-<time>.json)')
+    parser.add_argument('--baseline', help='Earlier results file to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Allowed relative slowdown before a metric counts as a regression')
+    parser.add_argument('--min-ms', type=float, default=1.0, help='Latency increase below which a step never counts as a regression')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    args.app_env = dict(item.split('=', 1) for item in args.app_env)
+    load_dotenv(os.path.join(ROOT, '.env'))
+
+    with Environment(args) as env:
+        print(f'app {env.base_url}, {args.concurrency} virtual users, {args.airlines} airlines at '
+              f'{1000 * args.latency:.0f}ms, site error rate {args.error_rate}, {args.duration:.0f}s + {args.warmup:.0f}s warmup')
+        started = time.monotonic()
+        recorder = Recorder(record_after=started + args.warmup, retries=args.retries)
+        stop_at = started + args.warmup + args.duration
+        monitor = Monitor(env.base_url)
+
+        def virtual_user(i):
+            rnd = random.Random(args.seed * 1000 + i)
+            session = Session(env.base_url, args.timeout)
+            while time.monotonic() < stop_at:
+                recorder.outcome(run_session(session, recorder, rnd, USER_EMAIL.format(i), args))
+            session.close()
+
+        threads = [threading.Thread(target=virtual_user, args=(i,)) for i in range(args.concurrency)]
+        monitor.start()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - recorder.record_after
+        monitor.stop.set()
+        monitor.join()
+        results = summarize(recorder, elapsed, monitor, args)
+
+    print_report(results)
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f'funnel-{datetime.now():%Y%m%d-%H%M%S}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'results written to {output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_ms)
+        if regressions:
+            print(f'{len(regressions)} regression(s): {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+Local stand-in airline and card issuer sites with tunable latency and error rates.
+
+They implement the script interface from reservas.txt, so they can be
+registered in the `airlines` / `card_issuers` tables like real sites:
+
+    python benchmarks/stubs.py --airlines AA,GU,TA --issuer VISA --latency 0.05 --error-rate 0.02
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from serializers import iter_xml, to_json  # noqa: E402
+
+SEAT_ROWS = 20
+SEAT_POSITIONS = 'ABCD'
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, code, routes, port=0, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        super().__init__(('127.0.0.1', port), _Handler)
+        self.code = code
+        self.routes = routes
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def host(self):
+        return '%s:%d' % self.server_address
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name=f'stub-{self.code}', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up mid-response; that is expected here.
+        pass
+
+    def delay_and_fail(self):
+        """Sleeps for the configured latency and returns True if this request should fail."""
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            fail = self.random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        return fail
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        xml = params.get('formato', 'JSON').upper() == 'XML'
+        route = self.server.routes.get(parts.path.strip('/'))
+        if route is None:
+            return self._send(404, {"error": "Unknown script"}, xml)
+        if self.server.delay_and_fail():
+            return self._send(500, {"error": "Injected failure"}, xml)
+        status, payload = route(self.server, params)
+        self._send(status, payload, xml)
+
+    def _send(self, status, payload, xml=False):
+        body = (''.join(iter_xml(payload)) if xml else to_json(payload)).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/xml' if xml else 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# --- AIRLINE SCRIPTS ---
+def _flight_numbers(code, origen, destino, count):
+    rnd = random.Random(f'{code}{origen}{destino}')
+    return sorted(rnd.sample(range(100, 1000), count))
+
+
+def lista_vuelos(server, params):
+    origen, destino, fecha = params.get('origen', ''), params.get('destino', ''), params.get('fecha', '')
+    vuelos = [
+        {"numero": str(numero), "hora": f"{6 + i * 2:02d}{(numero % 4) * 15:02d}", "precio": f"{250 + numero % 300}.00"}
+        for i, numero in enumerate(_flight_numbers(server.code, origen, destino, server.flights_per_route))
+    ]
+    return 200, {"lista_vuelos": {"aerolinea": server.code, "fecha": fecha, "origen": origen, "destino": destino, "vuelos": vuelos}}
+
+
+def lista_asientos(server, params):
+    asientos = [{"fila": str(fila), "posicion": pos} for fila in range(1, SEAT_ROWS + 1) for pos in SEAT_POSITIONS]
+    return 200, {"lista_asientos": {
+        "aerolinea": server.code, "numero": params.get('vuelo', ''), "fecha": params.get('fecha', ''),
+        "origen": "GUA", "destino": "MIA", "avion": "Airbus A320", "asientos": asientos,
+    }}
+
+
+def reserva(server, params):
+    with server._lock:
+        server.tickets += 1
+        numero = f'{server.code}{server.tickets:08d}'
+    return 200, {"boleto": {
+        "aerolinea": server.code, "vuelo": params.get('vuelo', ''), "fecha": params.get('fecha', ''),
+        "horra": "1400", "numero": numero,
+    }}
+
+
+def airline_server(code, port=0, flights_per_route=4, **options):
+    server = StubServer(code, {
+        'script_lista_vuelos': lista_vuelos,
+        'script_lista_asientos': lista_asientos,
+        'script_reserva': reserva,
+    }, port=port, **options)
+    server.flights_per_route = flights_per_route
+    server.tickets = 0
+    return server
+
+
+# --- CARD ISSUER SCRIPT ---
+def autorizacion(server, params):
+    tarjeta = params.get('tarjeta', '')
+    approved = len(tarjeta) == 16 and tarjeta.isdigit() and server.random.random() >= server.deny_rate
+    with server._lock:
+        server.authorizations += 1
+        numero = str(100000 + server.authorizations) if approved else "0"
+    return 200, {"autorizacion": {
+        "emisor": server.code, "tarjeta": tarjeta, "status": "APROBADO" if approved else "DENEGADO", "numero": numero,
+    }}
+
+
+def issuer_server(code, port=0, deny_rate=0.0, **options):
+    server = StubServer(code, {'autorizacion': autorizacion}, port=port, **options)
+    server.deny_rate = deny_rate
+    server.authorizations = 0
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--airlines', default='AA,GU', help='Comma-separated airline codes, one server each')
+    parser.add_argument('--issuer', default='VISA', help='Card issuer code (empty to skip)')
+    parser.add_argument('--port', type=int, default=9100, help='First port; each server takes the next one')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random +/- seconds around --latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 500')
+    args = parser.parse_args()
+
+    options = dict(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    servers = [airline_server(code, port=args.port + i, **options) for i, code in enumerate(filter(None, args.airlines.split(',')))]
+    if args.issuer:
+        servers.append(issuer_server(args.issuer, port=args.port + len(servers), **options))
+    for server in servers:
+        server.start()
+        print(f'{server.code}: http://{server.host}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Atomic seat claims.
+
+All seats of a purchase are inserted with a single multi-row INSERT executed
+in autocommit mode: the statement is its own transaction, so it costs one
+round-trip and either every seat is claimed or none is.  Double-selling is
+prevented by the unique index on (flight_code, flight_date, seat_number), not
+by a SELECT beforehand, so concurrent buyers cannot both pass a check.
+"""
+import re
+import uuid
+
+import psycopg2
+
+SEAT_PATTERN = re.compile(r'^(?:[1-9]|1[0-9]|20)[A-D]$')
+SEAT_CONSTRAINT = 'bookings_seat_unique'
+TICKET_CONSTRAINT = 'bookings_ticket_number_key'
+USER_CONSTRAINT = 'bookings_user_id_fkey'
+
+CLAIM_SQL = """
+    INSERT INTO bookings (user_id, flight_id, flight_code, flight_date, seat_number, passenger_name, ticket_number, price)
+    SELECT %s, %s, %s, %s, claim.seat, %s, claim.ticket, %s
+    FROM unnest(%s::varchar[], %s::varchar[]) AS claim(seat, ticket)
+    RETURNING seat_number, ticket_number
+"""
+
+
+class SeatConflict(Exception):
+    """Raised when one or more requested seats are already sold; nothing was booked."""
+
+    def __init__(self, seats):
+        super().__init__("Seats already booked: " + ", ".join(seats))
+        self.seats = seats
+
+
+class UnknownUser(Exception):
+    """Raised when the booking's user_id does not exist; nothing was booked."""
+
+    def __init__(self, user_id):
+        super().__init__(f"Unknown user: {user_id}")
+        self.user_id = user_id
+
+
+def new_ticket_number():
+    return uuid.uuid4().hex[:10].upper()
+
+
+def validate_seats(seats):
+    """Returns an error message for a malformed seat list, or None."""
+    if not seats:
+        return "At least one seat is required"
+    invalid = [s for s in seats if not isinstance(s, str) or not SEAT_PATTERN.match(s)]
+    if invalid:
+        return "Invalid seats (expected 1A to 20D): " + ", ".join(map(str, invalid))
+    if len(set(seats)) != len(seats):
+        return "Duplicate seats in request"
+    return None
+
+
+def claim_seats(conn, user_id, aerolinea, vuelo, flight_date, seats, nombre, precio):
+    """
+    Books every seat in ``seats`` or none of them.
+
+    Returns a list of (seat_number, ticket_number) in request order.  Raises
+    SeatConflict listing the seats that were already taken, or UnknownUser.
+    """
+    flight_code = f"{aerolinea}{vuelo}"
+    previous_autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        cursor = conn.cursor()
+        for attempt in range(2):
+            tickets = [new_ticket_number() for _ in seats]
+            try:
+                cursor.execute(CLAIM_SQL, (user_id, int(vuelo), flight_code, flight_date, nombre, precio, list(seats), tickets))
+                claimed = dict(cursor.fetchall())
+                break
+            except psycopg2.IntegrityError as e:
+                constraint = e.diag.constraint_name
+                if constraint == USER_CONSTRAINT:
+                    cursor.close()
+                    raise UnknownUser(user_id) from e
+                if constraint == SEAT_CONSTRAINT:
+                    cursor.execute(
+                        'SELECT seat_number FROM bookings WHERE flight_code = %s AND flight_date = %s AND seat_number = ANY(%s)',
+                        (flight_code, flight_date, list(seats))
+                    )
+                    taken = {row[0] for row in cursor.fetchall()}
+                    cursor.close()
+                    # A conflicting purchase may have rolled back meanwhile; report the whole request then.
+                    raise SeatConflict([s for s in seats if s in taken] or list(seats))
+                # A random ticket number collided; draw new ones once.
+                if constraint != TICKET_CONSTRAINT or attempt:
+                    raise
+        cursor.close()
+    finally:
+        conn.autocommit = previous_autocommit
+    return [(seat, claimed[seat]) for seat in seats]
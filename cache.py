@@ -0,0 +1,144 @@
+"""
+In-process TTL cache for availability lookups.
+
+Entries are fresh for ``ttl`` seconds and may then be served stale for another
+``stale_ttl`` seconds while a single background refresh runs.  Concurrent
+misses for the same key share one upstream call (single-flight).  The cache is
+bounded to ``maxsize`` entries and evicts the least recently used one.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Entry:
+    __slots__ = ('value', 'fresh_until', 'stale_until')
+
+    def __init__(self, value, fresh_until, stale_until):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class _Flight:
+    """An in-progress load that other callers for the same key wait on."""
+    __slots__ = ('done', 'value', 'error', 'invalidated')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.invalidated = False
+
+
+class TTLCache:
+    def __init__(self, ttl, stale_ttl=0.0, maxsize=1024, cache_if=None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        # Optional predicate; values it rejects are returned but not stored.
+        self.cache_if = cache_if
+        self._data = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.load_errors = 0
+
+    def get_or_load(self, key, loader):
+        """Returns the cached value for ``key``, calling ``loader()`` at most once per miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and now < entry.stale_until:
+                self._data.move_to_end(key)
+                if now < entry.fresh_until:
+                    self.hits += 1
+                    return entry.value
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    flight = self._inflight[key] = _Flight()
+                    threading.Thread(target=self._refresh, args=(key, loader, flight), daemon=True).start()
+                return entry.value
+
+            self.misses += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if leader:
+            return self._load(key, loader, flight)
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def invalidate(self, key):
+        """Drops ``key`` and discards the result of any load already in flight for it."""
+        with self._lock:
+            self._data.pop(key, None)
+            flight = self._inflight.pop(key, None)
+            if flight is not None:
+                flight.invalidated = True
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            for flight in self._inflight.values():
+                flight.invalidated = True
+            self._inflight.clear()
+
+    def _load(self, key, loader, flight):
+        try:
+            value = loader()
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self.load_errors += 1
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+            flight.done.set()
+            raise
+
+        flight.value = value
+        with self._lock:
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+            if not flight.invalidated and (self.cache_if is None or self.cache_if(value)):
+                now = time.monotonic()
+                self._data[key] = _Entry(value, now + self.ttl, now + self.ttl + self.stale_ttl)
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+        flight.done.set()
+        return value
+
+    def _refresh(self, key, loader, flight):
+        try:
+            self._load(key, loader, flight)
+        except Exception:
+            # The stale value keeps being served until it expires; the next miss retries.
+            pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.maxsize,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "load_errors": self.load_errors,
+                "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,278 @@
+"""
+Bounded, thread-safe PostgreSQL connection pool.
+
+Connections are checked out with ``pool.connection()``, which always returns
+them to the pool (rolled back if the caller did not commit), even when the
+request handler raises.  Stale or broken connections are recycled on checkout.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available before the checkout timeout."""
+
+
+class _Slot:
+    __slots__ = ('conn', 'created_at', 'last_used')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = self.last_used = time.monotonic()
+
+
+class _Waiter:
+    """A thread queued in getconn; putconn hands it a slot, or a free place to open one."""
+    __slots__ = ('cond', 'slot', 'may_open')
+
+    def __init__(self, lock):
+        self.cond = threading.Condition(lock)
+        self.slot = None
+        self.may_open = False
+
+
+class ConnectionPool:
+    """
+    Keeps between ``minconn`` and ``maxconn`` open connections.
+
+    - ``timeout``: seconds a checkout waits for a free connection before PoolTimeout.
+    - ``recycle``: connections older than this many seconds are closed and reopened.
+    - ``ping_after``: connections idle longer than this are checked with ``SELECT 1``.
+    """
+
+    def __init__(self, connect, minconn=1, maxconn=10, timeout=5.0, recycle=1800.0, ping_after=30.0):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Invalid pool size: minconn=%s maxconn=%s" % (minconn, maxconn))
+        self._connect = connect
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+
+        self._lock = threading.Lock()
+        self._idle = deque()
+        self._in_use = {}
+        self._size = 0
+        # Checkouts are served first come, first served: returned connections go to the oldest waiter
+        self._queue = deque()
+        self._warmed = False
+        self._closed = False
+
+        # Statistics
+        self._checkouts = 0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._max_waiters = 0
+
+    # --- CHECKOUT / RETURN ---
+    def getconn(self, timeout=None):
+        """Checks out a connection, waiting up to ``timeout`` seconds for one to free up."""
+        if not self._warmed:
+            self._warm()
+        started = time.monotonic()
+        deadline = started + (self.timeout if timeout is None else timeout)
+        with self._lock:
+            if self._closed:
+                raise PoolTimeout("Connection pool is closed")
+            if self._idle and not self._queue:
+                slot = self._idle.pop()
+            elif self._size < self.maxconn and not self._queue:
+                self._size += 1
+                slot = None
+            else:
+                waiter = _Waiter(self._lock)
+                self._queue.append(waiter)
+                self._max_waiters = max(self._max_waiters, len(self._queue))
+                while waiter.slot is None and not waiter.may_open:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or self._closed:
+                        self._queue.remove(waiter)
+                        if self._closed:
+                            raise PoolTimeout("Connection pool is closed")
+                        self._timeouts += 1
+                        raise PoolTimeout("No database connection available after %.1fs" % (time.monotonic() - started))
+                    waiter.cond.wait(remaining)
+                # slot stays None when the waiter was given a free place to open a new connection
+                slot = waiter.slot
+
+        try:
+            slot = self._open() if slot is None else self._validate(slot)
+        except Exception:
+            with self._lock:
+                self._hand_over(None)
+            raise
+
+        waited = time.monotonic() - started
+        with self._lock:
+            self._in_use[id(slot.conn)] = slot
+            self._checkouts += 1
+            self._wait_total += waited
+            if waited > self._wait_max:
+                self._wait_max = waited
+        return slot.conn
+
+    def putconn(self, conn, discard=False):
+        """Returns a connection to the pool, rolling back any open transaction."""
+        with self._lock:
+            slot = self._in_use.pop(id(conn), None)
+        if slot is None:
+            raise ValueError("Connection does not belong to this pool")
+
+        if not discard and not conn.closed:
+            try:
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        if discard or conn.closed or self._closed:
+            self._close_quietly(conn)
+            with self._lock:
+                self._hand_over(None)
+            return
+
+        slot.last_used = time.monotonic()
+        with self._lock:
+            self._hand_over(slot)
+
+    def _hand_over(self, slot):
+        """
+        With the lock held: gives ``slot`` to the oldest waiter, or makes it idle.
+        ``None`` releases a place in the pool (a connection was closed or failed to open).
+        """
+        if self._queue and not self._closed:
+            waiter = self._queue.popleft()
+            if slot is None:
+                waiter.may_open = True
+            else:
+                waiter.slot = slot
+            waiter.cond.notify()
+        elif slot is None:
+            self._size -= 1
+        else:
+            self._idle.append(slot)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Context-managed checkout.  Uncommitted work is rolled back on return;
+        connections that fail with a driver-level error are discarded.
+        """
+        conn = self.getconn(timeout)
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.putconn(conn, discard=broken)
+
+    def closeall(self):
+        """Closes idle connections and makes in-use ones close when returned."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            for waiter in self._queue:
+                waiter.cond.notify()
+        for slot in idle:
+            self._close_quietly(slot.conn)
+
+    # --- HEALTH CHECKS ---
+    def _open(self):
+        slot = _Slot(self._connect())
+        with self._lock:
+            self._created += 1
+        return slot
+
+    def _validate(self, slot):
+        now = time.monotonic()
+        stale = slot.conn.closed or (self.recycle and now - slot.created_at > self.recycle)
+        if not stale and self.ping_after is not None and now - slot.last_used > self.ping_after:
+            stale = not self._ping(slot.conn)
+        if not stale:
+            return slot
+        self._close_quietly(slot.conn)
+        with self._lock:
+            self._recycled += 1
+        return self._open()
+
+    @staticmethod
+    def _ping(conn):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _warm(self):
+        """Opens ``minconn`` connections on first use; failures surface on the real checkout."""
+        with self._lock:
+            if self._warmed:
+                return
+            self._warmed = True
+            missing = max(0, self.minconn - self._size)
+            self._size += missing
+        opened = 0
+        try:
+            for _ in range(missing):
+                slot = self._open()
+                with self._lock:
+                    self._hand_over(slot)
+                opened += 1
+        except psycopg2.Error:
+            with self._lock:
+                for _ in range(missing - opened):
+                    self._hand_over(None)
+
+    # --- STATISTICS ---
+    def stats(self):
+        with self._lock:
+            in_use = len(self._in_use)
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": in_use,
+                "max_size": self.maxconn,
+                "waiters": len(self._queue),
+                "max_waiters": self._max_waiters,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "created": self._created,
+                "recycled": self._recycled,
+                "checkout_wait_avg_ms": round(1000 * self._wait_total / self._checkouts, 3) if self._checkouts else 0.0,
+                "checkout_wait_max_ms": round(1000 * self._wait_max, 3),
+            }
+
+
+def pool_from_env(connection_factory=None):
+    """Builds the application pool from the DB_* environment variables."""
+    def connect():
+        return psycopg2.connect(host=os.getenv("DB_HOST"), database=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASSWORD"), port=os.getenv("DB_PORT"), connection_factory=connection_factory)
+
+    return ConnectionPool(
+        connect,
+        minconn=int(os.getenv("DB_POOL_MIN", "1")),
+        maxconn=int(os.getenv("DB_POOL_MAX", "10")),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", "5")),
+        recycle=float(os.getenv("DB_POOL_RECYCLE", "1800")),
+    )
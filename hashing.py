@@ -0,0 +1,249 @@
+"""
+Password hashing off the request threads.
+
+bcrypt is deliberately slow (tens to hundreds of ms of CPU per call), so it
+runs in a small process pool instead of the Flask worker threads.  Callers
+are admitted only while fewer than ``max_pending`` hashes are queued or
+running; beyond that ``HasherBusy`` is raised so the request can be shed with
+a 429 instead of tying up a worker.  Stored hashes with a cost other than the
+configured one are upgraded the next time their owner logs in.
+
+The request thread still waits for its hash, but at most ``max_pending`` of
+them do, and bcrypt never uses more than ``workers`` cores, so a login burst
+cannot take over the CPU and threads that flight and seat requests need.
+
+Workers are started with the forkserver method where the platform has it and
+with spawn elsewhere (Windows), never by forking the multithreaded app.
+Both re-import the main module, and whatever it imports, in each worker, so
+nothing starts at construction: the pool, the cost calibration and the dummy
+hash are set up on first use (or by an explicit ``start()``).
+"""
+import math
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+from metrics import account_hash, hash_latency
+
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+# bcrypt only uses the first 72 bytes of a password; older versions of the library truncated silently.
+MAX_PASSWORD_BYTES = 72
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing queue is full or a hash did not finish in time."""
+
+
+# --- WORKER FUNCTIONS (run in the pool processes) ---
+def _encode(password):
+    return password.encode('utf-8')[:MAX_PASSWORD_BYTES]
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(_encode(password), bcrypt.gensalt(rounds)).decode('ascii')
+
+
+def _check(password, pw_hash, rounds):
+    """(matches, new_hash); new_hash is set when the stored hash should be upgraded to ``rounds``."""
+    if not bcrypt.checkpw(_encode(password), pw_hash.encode('ascii')):
+        return False, None
+    if hash_cost(pw_hash) != rounds:
+        return True, _hash(password, rounds)
+    return True, None
+
+
+def _init_worker():
+    """
+    Worker initializer.  Ctrl-C is left to the app, and the worker exits once
+    the app process is gone, even if it was killed without shutting the pool down.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # The parent's sentinel becomes ready when the process that started this
+    # worker exits; with forkserver that is the app, not the fork server.
+    parent = multiprocessing.parent_process()
+    if parent is None:
+        return
+
+    def watch():
+        parent.join()
+        os._exit(0)
+    threading.Thread(target=watch, daemon=True).start()
+
+
+def _time_hash(rounds):
+    started = time.perf_counter()
+    bcrypt.hashpw(b'calibration', bcrypt.gensalt(rounds))
+    return time.perf_counter() - started
+
+
+def hash_cost(pw_hash):
+    """The work factor of a modular-crypt bcrypt hash ("$2b$12$..." -> 12), or None."""
+    try:
+        return int(pw_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def default_start_method():
+    methods = multiprocessing.get_all_start_methods()
+    return 'forkserver' if 'forkserver' in methods else 'spawn'
+
+
+class PasswordHasher:
+    def __init__(self, rounds=12, workers=None, max_pending=None, timeout=10.0, target_time=0.25, start_method=None):
+        # rounds=None picks, on first use, the highest cost that hashes within target_time seconds
+        self.rounds = rounds
+        self.target_time = target_time
+        # One core is left for the request threads by default
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.max_pending = max_pending or 4 * self.workers
+        self.timeout = timeout
+        self._context = multiprocessing.get_context(start_method or default_start_method())
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        # Serializes the one-time setup in start(), which waits on the pool
+        self._start_lock = threading.Lock()
+        self._executor = None
+        self._dummy_hash = None
+        self._pending = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._upgraded = 0
+
+    def start(self):
+        """
+        Starts the worker processes, calibrates the cost if needed and prepares
+        the dummy hash.  Runs on the first hash or verify if not called earlier.
+        """
+        with self._start_lock:
+            if self._dummy_hash is not None:
+                return
+            if self.rounds is None:
+                self.rounds = self._calibrate()
+            # Unknown emails are checked against this so they take as long as real ones.
+            self._dummy_hash = self._submit(_hash, 'dummy password', self.rounds)
+
+    def _calibrate(self):
+        """Highest cost whose hash takes at most target_time, measured in a worker."""
+        elapsed = self._executor_submit(_time_hash, MIN_ROUNDS).result()
+        # Each extra round doubles the work.
+        extra = math.floor(math.log2(self.target_time / elapsed)) if elapsed > 0 else 0
+        return max(MIN_ROUNDS, min(MAX_ROUNDS, MIN_ROUNDS + extra))
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    # --- PUBLIC API ---
+    def hash(self, password):
+        if self._dummy_hash is None:
+            self.start()
+        return self._submit(_hash, password, self.rounds)
+
+    def verify(self, password, pw_hash):
+        """
+        Checks ``password`` against a stored hash.  Returns (matches, new_hash);
+        when new_hash is not None the caller should store it in place of pw_hash.
+        """
+        if self._dummy_hash is None:
+            self.start()
+        ok, new_hash = self._submit(_check, password, pw_hash, self.rounds)
+        if new_hash is not None:
+            with self._lock:
+                self._upgraded += 1
+        return ok, new_hash
+
+    def verify_dummy(self, password):
+        """Spends the same time as verify() for an account that does not exist; always False."""
+        if self._dummy_hash is None:
+            self.start()
+        self._submit(_check, password, self._dummy_hash, self.rounds)
+        return False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "start_method": self._context.get_start_method(),
+                "rounds": self.rounds,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+                "upgraded": self._upgraded,
+            }
+
+    # --- ADMISSION CONTROL ---
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HasherBusy("Too many password hashes pending")
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._executor_submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is held until the worker finishes, even if the caller stops waiting.
+        future.add_done_callback(lambda _: self._release())
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            result = future.result(self.timeout)
+            outcome = 'ok'
+            return result
+        except FutureTimeout:
+            outcome = 'timeout'
+            with self._lock:
+                self._timeouts += 1
+            raise HasherBusy("Password hash did not finish in %.1fs" % self.timeout)
+        finally:
+            elapsed = time.perf_counter() - started
+            hash_latency.observe(elapsed, 'verify' if fn is _check else 'hash', outcome)
+            account_hash(elapsed)
+
+    def _executor_submit(self, fn, *args):
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._new_executor()
+            executor = self._executor
+        try:
+            return executor.submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed by the OOM killer); replace the pool once.
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = self._new_executor()
+                executor = self._executor
+            return executor.submit(fn, *args)
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context, initializer=_init_worker)
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+
+def hasher_from_env():
+    rounds = os.getenv("BCRYPT_LOG_ROUNDS", "12")
+    return PasswordHasher(
+        rounds=None if rounds == 'auto' else int(rounds),
+        workers=int(os.getenv("HASH_WORKERS", "0")) or None,
+        max_pending=int(os.getenv("HASH_MAX_PENDING", "0")) or None,
+        timeout=float(os.getenv("HASH_TIMEOUT", "10")),
+        target_time=float(os.getenv("HASH_TARGET_MS", "250")) / 1000,
+        start_method=os.getenv("HASH_START_METHOD") or None,
+    )
@@ -248,8 +248,9 @@ function handleFlightSearch(e) {
             if (vuelosData && vuelosData.vuelos) {
                 // Transform API response to match frontend format
                 const flights = vuelosData.vuelos.map(vuelo => ({
-                    aerolinea: vuelosData.aerolinea,
-                    aerolinea_nombre: vuelosData.aerolinea, // Will use mock name for now
+                    // Merged searches tag each flight with its airline
+                    aerolinea: vuelo.aerolinea || vuelosData.aerolinea,
+                    aerolinea_nombre: vuelo.aerolinea || vuelosData.aerolinea, // Will use mock name for now
                     numero: vuelo.numero,
                     origen: vuelosData.origen,
                     destino: vuelosData.destino,
@@ -264,6 +265,8 @@ function handleFlightSearch(e) {
                 
                 if (flights.length === 0) {
                     showToast('No se encontraron vuelos para la fecha seleccionada', 'info');
+                } else if (vuelosData.parcial) {
+                    showToast('Algunas aerolíneas no respondieron; los resultados pueden estar incompletos', 'warning');
                 }
             } else {
                 showToast('No se encontraron vuelos', 'info');
@@ -150,36 +150,26 @@ function processReservation(authResult) {
     // Show loading
     showLoading();
     
-    // Reserve each seat with the backend
-    const reservationCalls = currentBooking.selectedSeats.map(seat => {
-        return $.ajax({
-            url: '/api/reserva',
-            method: 'GET',
-            data: {
-                user_id: currentUser.id,
-                aerolinea: flight.aerolinea,
-                vuelo: flight.numero,
-                fecha: formattedDate,
-                asiento: seat,
-                nombre: (currentUser.full_name || currentUser.name).replace(/\s+/g, ''),
-                precio: flight.precio,
-                formato: 'JSON'
-            }
-        });
-    });
-    
-    // Wait for all reservations
-    $.when.apply($, reservationCalls).then(
-        function() {
+    // Reserve all seats in one request; either every seat is booked or none is
+    $.ajax({
+        url: '/api/reservas',
+        method: 'POST',
+        contentType: 'application/json',
+        data: JSON.stringify({
+            user_id: currentUser.id,
+            aerolinea: flight.aerolinea,
+            vuelo: flight.numero,
+            fecha: formattedDate,
+            asientos: currentBooking.selectedSeats,
+            nombre: (currentUser.full_name || currentUser.name).replace(/\s+/g, ''),
+            precio: flight.precio
+        })
+    }).then(
+        function(response) {
             hideLoading();
             
-            // Convert arguments to array (handles single or multiple results)
-            const results = reservationCalls.length === 1 ? [arguments[0]] : 
-                           Array.prototype.slice.call(arguments).map(arg => arg[0]);
-            
             // Generate tickets from reservation results
-            const tickets = results.map((response, index) => {
-                const boleto = response.boleto;
+            const tickets = response.boletos.map(boleto => {
                 return {
                     numero: boleto.numero,
                     pasajero: currentUser.full_name || currentUser.name,
@@ -194,7 +184,7 @@ function processReservation(authResult) {
                         duracion: flight.duracion,
                         avion: flight.avion
                     },
-                    asiento: currentBooking.selectedSeats[index],
+                    asiento: boleto.asiento,
                     precio: flight.precio,
                     fechaReserva: new Date().toISOString(),
                     autorizacion: authResult.numero,
@@ -224,7 +214,10 @@ function processReservation(authResult) {
         },
         function(xhr) {
             hideLoading();
-            const errorMsg = xhr.responseJSON?.error || 'Error al procesar la reserva';
+            const ocupados = xhr.responseJSON?.asientos_ocupados;
+            const errorMsg = ocupados
+                ? `Los asientos ${ocupados.join(', ')} ya fueron vendidos. Seleccione otros asientos.`
+                : (xhr.responseJSON?.error || 'Error al procesar la reserva');
             showToast(errorMsg, 'error');
         }
     );
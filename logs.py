@@ -0,0 +1,96 @@
+"""
+Structured, leveled and sampled logging for the app.
+
+Records are written one per line as ``key=value`` pairs (or JSON objects with
+LOG_FORMAT=json); values passed as ``extra={'fields': {...}}`` become keys
+of their own.  INFO and DEBUG records are sampled at LOG_SAMPLE_RATE.
+Warnings and errors are always kept, but at most ``burst`` per message per
+``window`` seconds, so a database outage logs a handful of lines instead of
+one per request; the next record let through reports how many were dropped.
+"""
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, sample_rate=1.0, burst=10, window=10.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.burst = burst
+        self.window = window
+        self._lock = threading.Lock()
+        # (logger, message template) -> [window start, records let through, records dropped]
+        self._seen = {}
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING:
+            return self.sample_rate >= 1 or random.random() < self.sample_rate
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            seen = self._seen.get(key)
+            if seen is None or now - seen[0] >= self.window:
+                if len(self._seen) >= 1024:
+                    self._seen.clear()
+                dropped = seen[2] if seen is not None else 0
+                seen = self._seen[key] = [now, 0, 0]
+            else:
+                dropped = 0
+            if seen[1] >= self.burst:
+                seen[2] += 1
+                return False
+            seen[1] += 1
+        if dropped:
+            record.suppressed = dropped
+        return True
+
+
+class StructuredFormatter(logging.Formatter):
+    converter = time.gmtime
+
+    def __init__(self, as_json=False):
+        super().__init__()
+        self.as_json = as_json
+
+    def format(self, record):
+        fields = {
+            "ts": self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + '.%03dZ' % record.msecs,
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields.update(getattr(record, 'fields', None) or {})
+        if getattr(record, 'suppressed', 0):
+            fields["suppressed"] = record.suppressed
+        if record.exc_info:
+            fields["error"] = self.formatException(record.exc_info)
+        if self.as_json:
+            return json.dumps(fields, default=str)
+        return ' '.join(f'{key}={_kv(value)}' for key, value in fields.items())
+
+
+def _kv(value):
+    text = str(value)
+    if not text or any(c in text for c in ' "=\n'):
+        return json.dumps(text)
+    return text
+
+
+def configure_logging():
+    """Sends the app's records to stderr as configured by LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATE and LOG_BURST."""
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(StructuredFormatter(as_json=os.getenv("LOG_FORMAT", "kv").lower() == 'json'))
+    handler.addFilter(SamplingFilter(
+        sample_rate=float(os.getenv("LOG_SAMPLE_RATE", "0.05")),
+        burst=int(os.getenv("LOG_BURST", "10")),
+    ))
+    root = logging.getLogger('trivago')
+    root.handlers[:] = [handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    root.propagate = False
+    return root
@@ -0,0 +1,360 @@
+"""
+Latency histograms and the Prometheus text exposition served at /metrics.
+
+Requests (``instrument``), SQL statements (``TimedConnection``), calls to
+airline and issuer sites and password hashes are all recorded in
+``Histogram`` objects.  An observation is one bisect and a few increments
+under a lock, cheap enough to leave on in production.  Besides the cumulative
+buckets Prometheus expects, each series keeps the observations of the last
+one to two ``window``s, from which /metrics also reports the current p50,
+p95 and p99.
+"""
+import bisect
+import logging
+import re
+import threading
+import time
+
+import psycopg2.extensions
+from flask import g, request
+
+# 0.5 ms to ~11.6 s; each bucket is sqrt(2) times wider than the previous one
+LATENCY_BUCKETS = tuple(round(0.0005 * 2 ** (i / 2), 6) for i in range(30))
+QUANTILES = (0.5, 0.95, 0.99)
+
+log = logging.getLogger('trivago.requests')
+
+
+# --- METRIC TYPES ---
+class _Series:
+    __slots__ = ('counts', 'sum', 'current', 'previous')
+
+    def __init__(self, size):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.current = [0] * size
+        self.previous = [0] * size
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, window=60.0):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.window = window
+        self._series = {}
+        self._lock = threading.Lock()
+        self._rotate_at = time.monotonic() + window
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._rotate_at:
+                self._rotate(now)
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = _Series(len(self.buckets) + 1)
+            series.counts[index] += 1
+            series.current[index] += 1
+            series.sum += value
+
+    def _rotate(self, now):
+        # After a whole idle window the previous window is stale as well
+        idle = now >= self._rotate_at + self.window
+        for series in self._series.values():
+            series.previous = [0] * len(series.current) if idle else series.current
+            series.current = [0] * len(series.previous)
+        self._rotate_at = now + self.window
+
+    def _quantile(self, counts, q):
+        """Estimates a quantile from per-bucket counts, interpolating inside the bucket like histogram_quantile()."""
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            if count and seen + count >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def snapshot(self):
+        """{labels: (cumulative counts, sum, recent counts)} copied under the lock."""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._rotate_at:
+                self._rotate(now)
+            return {
+                labels: (list(s.counts), s.sum, [a + b for a, b in zip(s.current, s.previous)])
+                for labels, s in self._series.items()
+            }
+
+    def collect(self):
+        bucket_lines, quantile_lines = [], []
+        for labels, (counts, total, recent) in sorted(self.snapshot().items()):
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                bucket_lines.append((self.name + '_bucket', dict(base, le=_format_value(bound)), cumulative))
+            bucket_lines.append((self.name + '_sum', base, total))
+            bucket_lines.append((self.name + '_count', base, cumulative))
+            for q in QUANTILES:
+                value = self._quantile(recent, q)
+                if value is not None:
+                    quantile_lines.append((self.name + '_recent', dict(base, quantile=str(q)), value))
+        yield self.name, 'histogram', self.documentation, bucket_lines
+        yield (self.name + '_recent', 'gauge',
+               f'p50/p95/p99 of {self.name} over the last {self.window:.0f}-{2 * self.window:.0f}s', quantile_lines)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        yield self.name, 'counter', self.documentation, [
+            (self.name, dict(zip(self.labelnames, labels)), value) for labels, value in values
+        ]
+
+
+# --- REGISTRY AND EXPOSITION ---
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def histogram(self, name, documentation, labelnames=(), **options):
+        metric = Histogram(name, documentation, labelnames, **options)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        """Registers ``fn() -> iterable of (name, type, help, [(sample name, labels, value)])``; usable as a decorator."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        """The Prometheus text format (version 0.0.4)."""
+        lines = []
+        families = [family for metric in self._metrics for family in metric.collect()]
+        for collector in self._collectors:
+            try:
+                families.extend(collector())
+            except Exception:
+                logging.getLogger('trivago.metrics').exception("Metrics collector %s failed", getattr(collector, '__name__', collector))
+        for name, kind, documentation, samples in families:
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            for sample, labels, value in samples:
+                lines.append(f'{sample}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '%s="%s"' % (k, str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')) for k, v in labels.items()
+    ) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float):
+        return repr(round(value, 9))
+    return str(value)
+
+
+def stats_families(prefix, rows, counters=()):
+    """
+    Converts ``stats()`` dicts into metric families.  ``rows`` is a list of
+    (labels, stats) pairs sharing one set of keys; keys in ``counters`` are
+    exported as ``<prefix>_<key>_total`` counters, the other numbers as gauges.
+    """
+    families = {}
+    for labels, stats in rows:
+        for key, value in stats.items():
+            if not isinstance(value, (int, float)):
+                continue
+            counter = key in counters
+            name = f'{prefix}_{key}_total' if counter else f'{prefix}_{key}'
+            family = families.setdefault(name, (name, 'counter' if counter else 'gauge', f'{prefix} {key}', []))
+            family[3].append((name, labels, value))
+    return list(families.values())
+
+
+REGISTRY = MetricsRegistry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+request_latency = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Time to serve a request, including streamed bodies', ('method', 'route', 'status'))
+query_latency = REGISTRY.histogram(
+    'db_query_duration_seconds', 'Time to execute one SQL statement', ('statement',))
+query_rows = REGISTRY.counter(
+    'db_query_rows_total', 'Rows returned or affected by SQL statements', ('statement',))
+query_errors = REGISTRY.counter(
+    'db_query_errors_total', 'SQL statements that raised', ('statement',))
+upstream_latency = REGISTRY.histogram(
+    'upstream_request_duration_seconds', 'Time of a call to an airline or card issuer site', ('site', 'script', 'outcome'))
+hash_latency = REGISTRY.histogram(
+    'password_hash_duration_seconds', 'Time a request waited for bcrypt, queueing included', ('operation', 'outcome'))
+
+
+# --- PER-REQUEST ACCOUNTING ---
+# Time spent on the DB and in bcrypt by the request the current thread is serving
+_local = threading.local()
+
+
+def _account(field, elapsed):
+    totals = getattr(_local, 'totals', None)
+    if totals is not None:
+        totals[field] += elapsed
+        totals[field + '_calls'] += 1
+
+
+def account_hash(elapsed):
+    _account('hash', elapsed)
+
+
+def instrument(app, slow_ms=500, skip=('/metrics',)):
+    """
+    Times every request from before_request until its response is closed, so
+    streamed bodies are included.  Requests slower than ``slow_ms`` are logged
+    as warnings with their DB and bcrypt time; the rest at INFO.
+    """
+    in_flight = [0]
+    lock = threading.Lock()
+
+    @REGISTRY.collector
+    def collect_in_flight():
+        return [('http_requests_in_flight', 'gauge', 'Requests being served', [('http_requests_in_flight', {}, in_flight[0])])]
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+        _local.totals = {'db': 0.0, 'db_calls': 0, 'hash': 0.0, 'hash_calls': 0}
+        with lock:
+            in_flight[0] += 1
+
+    @app.after_request
+    def stop_timer(response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        method, status = request.method, response.status_code
+        totals = _local.totals
+
+        def finish():
+            elapsed = time.perf_counter() - started
+            with lock:
+                in_flight[0] -= 1
+            _local.totals = None
+            if route in skip:
+                return
+            request_latency.observe(elapsed, method, route, str(status))
+            level = logging.WARNING if 1000 * elapsed >= slow_ms else logging.INFO
+            if log.isEnabledFor(level):
+                log.log(level, 'request', extra={'fields': {
+                    'method': method, 'route': route, 'status': status, 'ms': round(1000 * elapsed, 1),
+                    'db_ms': round(1000 * totals['db'], 1), 'db_queries': totals['db_calls'],
+                    'hash_ms': round(1000 * totals['hash'], 1),
+                }})
+
+        response.call_on_close(finish)
+        return response
+
+
+# --- DATABASE ---
+_STATEMENT_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE)\s+(\w+)', re.IGNORECASE)
+_statement_labels = {}
+
+
+def statement_label(query):
+    """'select bookings', 'insert bookings', 'select' (no table)... bounded cardinality for the statement label."""
+    label = _statement_labels.get(query)
+    if label is None:
+        text = query.decode('utf-8', 'replace') if isinstance(query, bytes) else str(query)
+        words = text.split(None, 1)
+        table = _STATEMENT_TABLE.search(text)
+        label = ' '.join(filter(None, [words[0].lower() if words else '', table.group(1).lower() if table else '']))
+        if len(_statement_labels) < 1024:
+            _statement_labels[query] = label
+    return label
+
+
+class _TimedCursorMixin:
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        except BaseException:
+            query_errors.inc(statement_label(query))
+            raise
+        finally:
+            self._record(query, time.perf_counter() - started)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        except BaseException:
+            query_errors.inc(statement_label(query))
+            raise
+        finally:
+            self._record(query, time.perf_counter() - started)
+
+    def _record(self, query, elapsed):
+        label = statement_label(query)
+        query_latency.observe(elapsed, label)
+        # Server-side (named) cursors only know their row count once fetched
+        if self.rowcount > 0:
+            query_rows.inc(label, amount=self.rowcount)
+        _account('db', elapsed)
+
+
+_timed_classes = {}
+
+
+def _timed(cursor_class):
+    timed = _timed_classes.get(cursor_class)
+    if timed is None:
+        if issubclass(cursor_class, _TimedCursorMixin):
+            timed = cursor_class
+        else:
+            timed = type('Timed' + cursor_class.__name__, (_TimedCursorMixin, cursor_class), {})
+        _timed_classes[cursor_class] = timed
+    return timed
+
+
+class TimedConnection(psycopg2.extensions.connection):
+    """Connection whose cursors, whatever their cursor_factory, record per-statement latency and rows."""
+
+    def cursor(self, name=None, cursor_factory=None, **kwargs):
+        factory = _timed(cursor_factory or self.cursor_factory or psycopg2.extensions.cursor)
+        return super().cursor(name, cursor_factory=factory, **kwargs)
@@ -0,0 +1,50 @@
+-- Tables used by app.py. Safe to run more than once:
+--   psql -d trivago -f schema.sql
+
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    full_name VARCHAR(100) NOT NULL,
+    email VARCHAR(100) UNIQUE NOT NULL,
+    password_hash VARCHAR(255) NOT NULL,
+    travel_document VARCHAR(50)
+);
+
+CREATE TABLE IF NOT EXISTS bookings (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER REFERENCES users(id),
+    flight_id INTEGER,
+    flight_code VARCHAR(10) NOT NULL,
+    flight_date DATE NOT NULL,
+    seat_number VARCHAR(3) NOT NULL,
+    passenger_name VARCHAR(100),
+    ticket_number VARCHAR(20) UNIQUE,
+    price DECIMAL(10, 2),
+    booking_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Registry of airline sites queried by /api/flights (see reservas.txt).
+CREATE TABLE IF NOT EXISTS airlines (
+    code VARCHAR(2) PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    host VARCHAR(255) NOT NULL,
+    script_lista_vuelos VARCHAR(100) NOT NULL DEFAULT 'script_lista_vuelos',
+    script_lista_asientos VARCHAR(100) NOT NULL DEFAULT 'script_lista_asientos',
+    script_reserva VARCHAR(100) NOT NULL DEFAULT 'script_reserva',
+    active BOOLEAN NOT NULL DEFAULT TRUE
+);
+
+-- Registry of credit card issuers queried by /api/autorizacion.
+CREATE TABLE IF NOT EXISTS card_issuers (
+    code VARCHAR(15) PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    host VARCHAR(255) NOT NULL,
+    script_autorizacion VARCHAR(100) NOT NULL DEFAULT 'autorizacion',
+    card_prefix VARCHAR(6) NOT NULL DEFAULT '',
+    active BOOLEAN NOT NULL DEFAULT TRUE
+);
+
+-- One booking per seat and flight date; seat claims rely on this index (bookings.py).
+CREATE UNIQUE INDEX IF NOT EXISTS bookings_seat_unique ON bookings (flight_code, flight_date, seat_number);
+
+-- Keyset pagination of a user's history (/api/users/<id>/bookings).
+CREATE INDEX IF NOT EXISTS bookings_user_history ON bookings (user_id, flight_date DESC, id DESC);
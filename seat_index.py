@@ -0,0 +1,250 @@
+"""
+In-memory seat availability index.
+
+Every aircraft has the fixed 20 x 4 layout from reservas.txt (1A to 20D), so
+the seats booked on one (flight_code, flight_date) fit in an 80-bit integer:
+bit ``(fila - 1) * 4 + posicion`` is set when the seat is sold.  The index is
+built with one bulk query over `bookings`, updated in place when seats are
+claimed, and reloaded lazily for flights it has not seen (or has held longer
+than ``max_age``, since other app processes may have sold seats meanwhile).
+The seats each airline offers on a flight are recorded separately, as the
+seat map is fetched, so group queries only consider seats that exist.
+Both are bounded to ``maxsize`` flights, evicting the least recently used,
+and flights whose date has passed are dropped.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+ROWS = 20
+POSITIONS = 'ABCD'
+SEAT_COUNT = ROWS * len(POSITIONS)
+FULL_MASK = (1 << SEAT_COUNT) - 1
+
+SEAT_CODES = tuple(f'{fila}{pos}' for fila in range(1, ROWS + 1) for pos in POSITIONS)
+SEAT_BITS = {code: 1 << i for i, code in enumerate(SEAT_CODES)}
+# Shared, read-only seat dicts; responses reference these instead of building new ones.
+SEAT_DICTS = tuple({"fila": code[:-1], "posicion": code[-1]} for code in SEAT_CODES)
+
+# _BYTE_SEATS[i][b]: the seat dicts for byte value b of the mask's i-th byte (two rows).
+_BYTE_SEATS = tuple(
+    tuple(tuple(SEAT_DICTS[i * 8 + bit] for bit in range(8) if value >> bit & 1) for value in range(256))
+    for i in range(SEAT_COUNT // 8)
+)
+
+# BLOCK_STARTS[n]: bits where a block of n seats fits before the end of the row.
+# The aisle between B and C is not treated as a break.
+_ROW_STARTS = [sum(1 << (row * len(POSITIONS) + p) for row in range(ROWS)) for p in range(len(POSITIONS))]
+BLOCK_STARTS = [0] + [sum(_ROW_STARTS[:len(POSITIONS) - n + 1]) for n in range(1, len(POSITIONS) + 1)]
+
+
+def seat_mask(seats):
+    """Bitmask for an iterable of seat codes; codes outside 1A-20D are ignored."""
+    mask = 0
+    for seat in seats:
+        mask |= SEAT_BITS.get(seat, 0)
+    return mask
+
+
+def seats_from_mask(mask):
+    """The shared seat dicts for every set bit, in seat-map order."""
+    seats = []
+    extend = seats.extend
+    for table in _BYTE_SEATS:
+        extend(table[mask & 0xFF])
+        mask >>= 8
+    return seats
+
+
+def has_free_block(free, n):
+    """True if ``free`` has ``n`` consecutive free seats in one row."""
+    if n < 1 or n > len(POSITIONS):
+        return n < 1
+    run = free
+    for k in range(1, n):
+        run &= free >> k
+    return bool(run & BLOCK_STARTS[n])
+
+
+class _Load:
+    """A flight being read from the database; other lookups of it wait for this one."""
+    __slots__ = ('done', 'mask', 'error', 'pending', 'invalidated')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.mask = None
+        self.error = None
+        # Seats claimed while the query runs, merged into its result
+        self.pending = 0
+        self.invalidated = False
+
+
+class SeatIndex:
+    def __init__(self, max_age=60.0, maxsize=50000):
+        self.max_age = max_age
+        self.maxsize = maxsize
+        self._booked = OrderedDict()
+        self._loaded_at = {}
+        # Seats the airline offers, for flights whose seat map has been fetched
+        self._offered = OrderedDict()
+        # Date of the last sweep for flights in the past
+        self._today = None
+        # (flight_code, flight_date) -> _Load, at most one per flight
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # --- LOADING ---
+    def warm(self, conn, since):
+        """Indexes every flight from ``since`` on with a single query."""
+        cursor = conn.cursor()
+        cursor.execute('SELECT flight_code, flight_date, seat_number FROM bookings WHERE flight_date >= %s', (since,))
+        self.load_rows(cursor)
+        cursor.close()
+
+    def load_rows(self, rows):
+        """Replaces the index with (flight_code, flight_date, seat_number) rows."""
+        booked = OrderedDict()
+        for flight_code, flight_date, seat in rows:
+            key = (flight_code, flight_date)
+            booked[key] = booked.get(key, 0) | SEAT_BITS.get(seat, 0)
+        now = time.monotonic()
+        with self._lock:
+            for key, load in self._inflight.items():
+                booked[key] = booked.get(key, 0) | load.pending
+            while len(booked) > self.maxsize:
+                booked.popitem(last=False)
+                self.evictions += 1
+            self._booked = booked
+            self._loaded_at = dict.fromkeys(booked, now)
+
+    def booked(self, conn_factory, flight_code, flight_date):
+        """
+        Booked-seat mask for one flight.  On a miss, ``conn_factory()`` must
+        return a context manager yielding a DB connection used to load it;
+        concurrent misses for the same flight share one query.
+        """
+        key = (flight_code, flight_date)
+        now = time.monotonic()
+        with self._lock:
+            mask = self._booked.get(key)
+            if mask is not None and (not self.max_age or now - self._loaded_at[key] < self.max_age):
+                self.hits += 1
+                self._booked.move_to_end(key)
+                return mask
+            self.misses += 1
+            load = self._inflight.get(key)
+            leader = load is None
+            if leader:
+                load = self._inflight[key] = _Load()
+
+        if not leader:
+            load.done.wait()
+            if load.error is not None:
+                raise load.error
+            return load.mask
+
+        try:
+            with conn_factory() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT seat_number FROM bookings WHERE flight_code = %s AND flight_date = %s', key)
+                mask = seat_mask(row[0] for row in cursor.fetchall())
+                cursor.close()
+        except BaseException as e:
+            load.error = e
+            with self._lock:
+                if self._inflight.get(key) is load:
+                    del self._inflight[key]
+            load.done.set()
+            raise
+
+        with self._lock:
+            mask |= load.pending
+            if self._inflight.get(key) is load:
+                del self._inflight[key]
+            # An invalidated load may predate the sale that invalidated it; the next lookup reads again
+            if not load.invalidated:
+                self._loaded_at[key] = time.monotonic()
+                self._put(self._booked, key, mask)
+        load.mask = mask
+        load.done.set()
+        return mask
+
+    # --- UPDATES ---
+    def mark_booked(self, flight_code, flight_date, seats):
+        """Records seats that were just claimed; flights not indexed yet are loaded on demand."""
+        bits = seat_mask(seats)
+        key = (flight_code, flight_date)
+        with self._lock:
+            if key in self._booked:
+                self._booked[key] |= bits
+            load = self._inflight.get(key)
+            if load is not None:
+                load.pending |= bits
+
+    def set_offered(self, flight_code, flight_date, mask):
+        """Records the seats the airline's seat map offers on a flight."""
+        with self._lock:
+            self._put(self._offered, (flight_code, flight_date), mask)
+
+    def invalidate(self, flight_code, flight_date):
+        """Forgets a flight so the next lookup reloads it from the database."""
+        key = (flight_code, flight_date)
+        with self._lock:
+            self._booked.pop(key, None)
+            self._loaded_at.pop(key, None)
+            load = self._inflight.pop(key, None)
+            if load is not None:
+                load.invalidated = True
+
+    def _put(self, table, key, value):
+        """With the lock held: stores ``value`` as the most recently used entry of ``table``."""
+        self._drop_past()
+        table[key] = value
+        table.move_to_end(key)
+        while len(table) > self.maxsize:
+            evicted, _ = table.popitem(last=False)
+            if table is self._booked:
+                del self._loaded_at[evicted]
+            self.evictions += 1
+
+    def _drop_past(self):
+        """With the lock held: forgets flights before today, at most once a day."""
+        today = date.today()
+        if today == self._today:
+            return
+        self._today = today
+        for table in (self._booked, self._offered):
+            for key in [key for key in table if key[1] < today]:
+                del table[key]
+                self._loaded_at.pop(key, None)
+
+    # --- BULK QUERIES ---
+    def flights_with_free_block(self, n, flight_date=None):
+        """
+        (flight_code, flight_date) keys with at least ``n`` adjacent free seats
+        in one row.  Only flights with both a recorded seat map and a loaded
+        booked mask are considered: one invalidated after a conflict, or whose
+        load failed, would otherwise look empty.
+        """
+        with self._lock:
+            booked = self._booked
+            free = [
+                (key, offered & ~booked[key]) for key, offered in self._offered.items()
+                if key in booked and (flight_date is None or key[1] == flight_date)
+            ]
+        return [key for key, mask in free if has_free_block(mask, n)]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "flights": len(self._booked),
+                "seat_maps": len(self._offered),
+                "max_size": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,197 @@
+"""
+JSON and XML representations of the web service documents in reservas.txt.
+
+Responses are built once as plain dicts (the JSON shape) and written as XML by
+``iter_xml``, which streams text chunks from precompiled element templates
+instead of building a DOM.  ``parse_document`` reads either format from a
+file-like object; XML is parsed incrementally and both formats are normalized
+to the canonical field names, whatever variant the remote site used.
+"""
+import json
+import xml.etree.ElementTree as ET
+from datetime import date, datetime
+from decimal import Decimal
+
+# Spec lists whose items appear directly under the root: <lista_vuelos><vuelo>...</vuelo></lista_vuelos>
+ITEM_TAGS = {"vuelos": "vuelo", "asientos": "asiento"}
+# Other lists get a wrapper element named after the key, holding one element per item
+WRAPPED_ITEM_TAGS = {
+    "boletos": "boleto",
+    "asientos_ocupados": "asiento",
+    "aerolineas_sin_respuesta": "aerolinea",
+    "aerolineas": "aerolinea",
+    "emisores": "emisor",
+}
+LIST_KEYS = {tag: key for key, tag in ITEM_TAGS.items()}
+
+# Field names used by the samples in reservas.txt, mapped to the ones this site uses
+FIELD_ALIASES = {
+    "origin": "origen",
+    "design": "destino",
+    "file": "fila",
+    "position": "posicion",
+    "horaz": "hora",
+    "horra": "hora",
+}
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>\n'
+CHUNK_ITEMS = 256
+
+_ESCAPES = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
+_templates = {}
+
+
+# --- WRITING ---
+def to_json(payload):
+    return json.dumps(payload, default=_json_default)
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _text(value):
+    if value.__class__ is str:
+        return value.translate(_ESCAPES) if ('&' in value or '<' in value or '>' in value) else value
+    if value is None:
+        return ''
+    if value is True or value is False:
+        return 'true' if value else 'false'
+    if isinstance(value, (dict, list, tuple)):
+        raise TypeError("nested value")
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value).translate(_ESCAPES)
+
+
+def _template(tag, keys):
+    """'<tag><k1>{}</k1>...</tag>' for a flat element, compiled once per shape."""
+    template = _templates.get((tag, keys))
+    if template is None:
+        template = _templates[(tag, keys)] = '<%s>%s</%s>' % (tag, ''.join('<%s>{}</%s>' % (k, k) for k in keys), tag)
+    return template
+
+
+def iter_xml(payload, root=None):
+    """
+    Yields the XML document for ``payload`` in chunks.  A dict whose single
+    key holds a dict or list names the root element; anything else is wrapped
+    in ``root`` (default <respuesta>), and a bare list becomes a list of
+    ``root`` items.
+    """
+    if isinstance(payload, list):
+        root = root or 'boletos'
+        yield XML_DECLARATION + '<%s>' % root
+        yield from iter_xml_items(ITEM_TAGS.get(root) or WRAPPED_ITEM_TAGS.get(root, 'item'), payload)
+        yield '</%s>' % root
+        return
+    if root is None and len(payload) == 1 and isinstance(next(iter(payload.values())), (dict, list)):
+        root, body = next(iter(payload.items()))
+        if isinstance(body, list):
+            yield from iter_xml(body, root)
+            return
+    else:
+        root, body = root or 'respuesta', payload
+    yield XML_DECLARATION + '<%s>' % root
+    yield from _iter_fields(body)
+    yield '</%s>' % root
+
+
+def _iter_fields(body):
+    for key, value in body.items():
+        if isinstance(value, list):
+            if key in ITEM_TAGS:
+                yield from iter_xml_items(ITEM_TAGS[key], value)
+            else:
+                yield '<%s>' % key
+                yield from iter_xml_items(WRAPPED_ITEM_TAGS.get(key, 'item'), value)
+                yield '</%s>' % key
+        elif isinstance(value, dict):
+            yield '<%s>%s</%s>' % (key, ''.join(_iter_fields(value)), key)
+        else:
+            yield '<%s>%s</%s>' % (key, _text(value), key)
+
+
+def iter_xml_items(tag, items):
+    """Yields ``<tag>`` elements for ``items``, joined into chunks of CHUNK_ITEMS."""
+    parts = []
+    for item in items:
+        if isinstance(item, dict):
+            try:
+                parts.append(_template(tag, tuple(item)).format(*map(_text, item.values())))
+            except TypeError:
+                parts.append('<%s>%s</%s>' % (tag, ''.join(_iter_fields(item)), tag))
+        else:
+            parts.append('<%s>%s</%s>' % (tag, _text(item), tag))
+        if len(parts) >= CHUNK_ITEMS:
+            yield ''.join(parts)
+            parts = []
+    if parts:
+        yield ''.join(parts)
+
+
+# --- PARSING ---
+def parse_document(stream, content_type=''):
+    """Parses a JSON or XML document from ``stream`` into the canonical dict shape."""
+    if 'xml' in content_type:
+        return parse_xml(stream)
+    return normalize(json.load(stream))
+
+
+def normalize(value):
+    """Renames the spec's field-name variants throughout a decoded JSON document."""
+    if isinstance(value, dict):
+        return {FIELD_ALIASES.get(k, k): normalize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [normalize(v) for v in value]
+    return value
+
+
+def parse_xml(stream):
+    """
+    Incrementally parses an XML document.  Each direct child of the root is
+    converted and discarded as soon as it ends, so long <vuelo> or <asiento>
+    lists never exist as a full tree.
+    """
+    root = None
+    body = {}
+    # Set for list documents such as <boletos><boleto>..</boleto></boletos>
+    items = None
+    depth = 0
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if root is None:
+                root = elem
+                if root.tag in WRAPPED_ITEM_TAGS:
+                    items = []
+            continue
+        depth -= 1
+        if depth != 1:
+            continue
+        tag = FIELD_ALIASES.get(elem.tag, elem.tag)
+        if items is not None:
+            items.append(_element_value(elem))
+        elif tag in LIST_KEYS:
+            body.setdefault(LIST_KEYS[tag], []).append(_element_value(elem))
+        elif tag in WRAPPED_ITEM_TAGS:
+            body[tag] = [_element_value(child) for child in elem]
+        else:
+            body[tag] = _element_value(elem)
+        root.clear()
+
+    if root is None:
+        raise ValueError("Empty XML document")
+    if items is not None:
+        return {root.tag: items}
+    return {FIELD_ALIASES.get(root.tag, root.tag): body}
+
+
+def _element_value(elem):
+    if len(elem) == 0:
+        return (elem.text or '').strip()
+    return {FIELD_ALIASES.get(child.tag, child.tag): _element_value(child) for child in elem}
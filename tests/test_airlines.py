@@ -0,0 +1,182 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import airlines
+from airlines import Airline, CircuitBreaker, FlightSearch, Registry, parse_flights, parse_seats
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(airlines, 'time', SimpleNamespace(monotonic=clock, perf_counter=time.perf_counter))
+    return clock
+
+
+class FakeClient:
+    """Stands in for HttpClient: each airline answers one flight after its delay, or HTTP 500 if failing."""
+
+    def __init__(self, delay=0.0, delays=None, failing=()):
+        self.delay = delay
+        self.delays = delays or {}
+        self.failing = set(failing)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def get(self, host, script, params, timeout=None, parse=None):
+        with self._lock:
+            self.calls.append(host)
+        time.sleep(self.delays.get(host, self.delay))
+        if host in self.failing:
+            return 500, 'application/json', None
+        return 200, 'application/json', {"lista_vuelos": {"vuelos": [{"numero": 100, "hora": "0830", "precio": "380.50"}]}}
+
+
+def registry(*codes):
+    reg = Registry()
+    reg.replace([Airline(code, code, code, 'vuelos', 'asientos', 'reserva') for code in codes])
+    return reg
+
+
+# --- CIRCUIT BREAKER ---
+def test_breaker_opens_after_threshold_failures(clock):
+    breaker = CircuitBreaker(threshold=3, reset_after=30.0)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == 'closed' and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+
+
+def test_breaker_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+
+
+def test_half_open_breaker_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(threshold=1, reset_after=30.0)
+    breaker.record_failure()
+    clock.now += 30.0
+    assert breaker.state == 'half-open'
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.allow()
+
+
+def test_failed_trial_reopens_breaker(clock):
+    breaker = CircuitBreaker(threshold=5, reset_after=30.0)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 30.0
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    clock.now += 29.0
+    assert not breaker.allow()
+
+
+def test_released_trial_can_be_retried(clock):
+    breaker = CircuitBreaker(threshold=1, reset_after=30.0)
+    breaker.record_failure()
+    clock.now += 30.0
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == 'half-open' and breaker.allow()
+
+
+# --- FLIGHT SEARCH ---
+def test_search_merges_airlines_sorted_by_time():
+    search = FlightSearch(registry('GU', 'AA'), FakeClient())
+    try:
+        result = search.search('GUA', 'MIA', '20991101')["lista_vuelos"]
+    finally:
+        search.shutdown()
+    assert result["vuelos"] == [
+        {"aerolinea": "AA", "numero": "100", "hora": "0830", "precio": "380.50"},
+        {"aerolinea": "GU", "numero": "100", "hora": "0830", "precio": "380.50"},
+    ]
+    assert not result["parcial"] and result["aerolineas_sin_respuesta"] == []
+
+
+def test_failing_and_slow_airlines_give_partial_results():
+    client = FakeClient(delays={'CC': 1.0}, failing={'BB'})
+    search = FlightSearch(registry('AA', 'BB', 'CC'), client, deadline=0.2)
+    try:
+        started = time.monotonic()
+        result = search.search('GUA', 'MIA', '20991101')["lista_vuelos"]
+        assert time.monotonic() - started < 0.5
+    finally:
+        search.shutdown()
+    assert [v["aerolinea"] for v in result["vuelos"]] == ['AA']
+    assert result["parcial"] and result["aerolineas_sin_respuesta"] == ['BB', 'CC']
+
+
+def test_open_breaker_skips_the_airline_without_calling_it():
+    client = FakeClient(failing={'BB'})
+    search = FlightSearch(registry('AA', 'BB'), client, breaker_threshold=1)
+    try:
+        search.search('GUA', 'MIA', '20991101')
+        assert search.breaker_states()['BB'] == 'open'
+        client.calls.clear()
+        result = search.search('GUA', 'MIA', '20991101')["lista_vuelos"]
+    finally:
+        search.shutdown()
+    assert client.calls == ['AA']
+    assert result["aerolineas_sin_respuesta"] == ['BB']
+
+
+def test_calls_pending_at_the_deadline_are_cancelled():
+    client = FakeClient(delay=1.0)
+    search = FlightSearch(registry('AA', 'BB', 'CC', 'DD'), client, deadline=0.2, max_workers=2)
+    try:
+        for _ in range(3):
+            started = time.monotonic()
+            result = search.search('GUA', 'MIA', '20991101')["lista_vuelos"]
+            assert time.monotonic() - started < 0.5
+            assert result["parcial"] and result["vuelos"] == []
+        time.sleep(1.2)
+        # Only the two calls that had a thread when the first search started ever ran
+        assert len(client.calls) == 2
+        # Cancelled calls do not count against the airlines' breakers
+        assert search.breaker_states() == {code: 'closed' for code in ('AA', 'BB', 'CC', 'DD')}
+    finally:
+        search.shutdown()
+
+
+# --- PARSERS ---
+def test_parse_flights_accepts_a_single_flight_object():
+    payload = {"lista_vuelos": {"vuelos": {"numero": 7, "hora": "0900", "precio": 99}}}
+    assert parse_flights('AA', payload) == [{"aerolinea": "AA", "numero": "7", "hora": "0900", "precio": "99"}]
+
+
+def test_parse_flights_without_flights():
+    assert parse_flights('AA', {"lista_vuelos": {"vuelos": None}}) == []
+    assert parse_flights('AA', {"vuelos": [{"numero": "1"}]}) == [{"aerolinea": "AA", "numero": "1", "hora": "", "precio": ""}]
+
+
+def test_parse_seats_normalizes_the_document():
+    payload = {"lista_asientos": {"numero": 100, "fecha": 20991101, "origen": "GUA", "destino": "MIA", "avion": "A320",
+                                  "asientos": [{"fila": 1, "posicion": "A"}, {"fila": "2", "posicion": "C"}]}}
+    assert parse_seats('AA', payload) == {
+        "aerolinea": "AA", "numero": "100", "fecha": "20991101", "origen": "GUA", "destino": "MIA", "avion": "A320",
+        "asientos": [{"fila": "1", "posicion": "A"}, {"fila": "2", "posicion": "C"}],
+    }
+
+
+def test_parse_seats_accepts_a_single_seat_object():
+    seats = parse_seats('GU', {"asientos": {"fila": 3, "posicion": "B"}})
+    assert seats["aerolinea"] == 'GU' and seats["asientos"] == [{"fila": "3", "posicion": "B"}]
@@ -0,0 +1,142 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import cache
+from cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, 'time', SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.001)
+
+
+class BlockingLoader:
+    """Loader that returns ``value`` once released, counting its calls."""
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        assert self.release.wait(2)
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+
+def test_hit_within_ttl(clock):
+    c = TTLCache(ttl=10)
+    assert c.get_or_load('k', lambda: 1) == 1
+    clock.now += 9
+    assert c.get_or_load('k', lambda: 2) == 1
+    clock.now += 2
+    assert c.get_or_load('k', lambda: 2) == 2
+    assert c.stats()["hits"] == 1
+
+
+def test_concurrent_misses_share_one_load():
+    c = TTLCache(ttl=10)
+    loader = BlockingLoader('value')
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(c.get_or_load('k', loader))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: c.stats()["misses"] == 5)
+    loader.release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ['value'] * 5
+    assert loader.calls == 1
+    assert c.stats()["coalesced"] == 4
+
+
+def test_load_error_reaches_every_waiter_and_is_not_cached():
+    c = TTLCache(ttl=10)
+    loader = BlockingLoader(RuntimeError("upstream down"))
+    errors = []
+
+    def get():
+        try:
+            c.get_or_load('k', loader)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=get) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: c.stats()["misses"] == 3)
+    loader.release.set()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 3 and loader.calls == 1
+    assert c.get_or_load('k', lambda: 'ok') == 'ok'
+
+
+def test_stale_value_is_served_while_one_refresh_runs(clock):
+    c = TTLCache(ttl=10, stale_ttl=30)
+    c.get_or_load('k', lambda: 'old')
+    clock.now += 15
+    loader = BlockingLoader('new')
+    assert c.get_or_load('k', loader) == 'old'
+    assert c.get_or_load('k', loader) == 'old'
+    wait_for(lambda: loader.calls == 1)
+    loader.release.set()
+    wait_for(lambda: not c._inflight)
+    assert c.get_or_load('k', loader) == 'new'
+    assert loader.calls == 1
+    assert c.stats()["stale_hits"] == 2
+
+
+def test_expired_stale_value_is_reloaded(clock):
+    c = TTLCache(ttl=10, stale_ttl=30)
+    c.get_or_load('k', lambda: 'old')
+    clock.now += 41
+    assert c.get_or_load('k', lambda: 'new') == 'new'
+
+
+def test_invalidate_during_load_discards_the_result():
+    c = TTLCache(ttl=10)
+    loader = BlockingLoader('before')
+    results = []
+    thread = threading.Thread(target=lambda: results.append(c.get_or_load('k', loader)))
+    thread.start()
+    wait_for(lambda: loader.calls == 1)
+    c.invalidate('k')
+    loader.release.set()
+    thread.join()
+    # The caller that started the load still gets its value, but it is not stored
+    assert results == ['before']
+    assert c.get_or_load('k', lambda: 'after') == 'after'
+
+
+def test_cache_if_and_lru_eviction():
+    c = TTLCache(ttl=10, maxsize=2, cache_if=lambda value: value is not None)
+    assert c.get_or_load('none', lambda: None) is None
+    assert c.get_or_load('none', lambda: 'loaded') == 'loaded'
+    c.get_or_load('a', lambda: 'a')
+    c.get_or_load('none', lambda: 'unused')
+    c.get_or_load('b', lambda: 'b')
+    assert c.get_or_load('a', lambda: 'reloaded') == 'reloaded'
+    assert c.stats()["evictions"] == 2
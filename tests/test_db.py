@@ -0,0 +1,169 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import psycopg2
+import psycopg2.extensions
+import pytest
+
+from db import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = 0
+        self.rollbacks = 0
+        self.info = SimpleNamespace(transaction_status=psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+def make_pool(**kwargs):
+    opened = []
+
+    def connect():
+        opened.append(FakeConnection(len(opened) + 1))
+        return opened[-1]
+
+    kwargs.setdefault('minconn', 0)
+    kwargs.setdefault('ping_after', None)
+    return ConnectionPool(connect, **kwargs), opened
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.001)
+
+
+def start_waiter(pool, results, name, timeout=2.0):
+    def run():
+        try:
+            conn = pool.getconn(timeout)
+        except PoolTimeout as e:
+            results.append((name, e))
+            return
+        results.append((name, conn))
+        pool.putconn(conn)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_reuses_idle_connection_and_rolls_back():
+    pool, opened = make_pool(maxconn=2)
+    conn = pool.getconn()
+    conn.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+    pool.putconn(conn)
+    assert conn.rollbacks == 1
+    assert pool.getconn() is conn
+    assert len(opened) == 1
+
+
+def test_waiters_are_served_in_arrival_order():
+    pool, opened = make_pool(maxconn=1)
+    conn = pool.getconn()
+    results = []
+    first = start_waiter(pool, results, 'first')
+    wait_for(lambda: pool.stats()["waiters"] == 1)
+    second = start_waiter(pool, results, 'second')
+    wait_for(lambda: pool.stats()["waiters"] == 2)
+
+    pool.putconn(conn)
+    first.join()
+    second.join()
+    assert [name for name, _ in results] == ['first', 'second']
+    assert all(got is conn for _, got in results)
+    assert len(opened) == 1
+
+
+def test_returned_connection_is_not_taken_by_a_new_arrival():
+    pool, _ = make_pool(maxconn=1)
+    conn = pool.getconn()
+    results = []
+    waiter = start_waiter(pool, results, 'waiter')
+    wait_for(lambda: pool.stats()["waiters"] == 1)
+    # The returning thread asks again straight away, before the woken waiter has run
+    pool.putconn(conn)
+    with pytest.raises(PoolTimeout):
+        pool.getconn(timeout=0)
+    waiter.join()
+    assert results == [('waiter', conn)]
+
+
+def test_checkout_times_out():
+    pool, _ = make_pool(maxconn=1)
+    pool.getconn()
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.getconn(timeout=0.05)
+    assert time.monotonic() - started < 1
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["waiters"] == 0
+
+
+def test_broken_connection_is_discarded():
+    pool, opened = make_pool(maxconn=1)
+    with pytest.raises(psycopg2.OperationalError):
+        with pool.connection() as conn:
+            raise psycopg2.OperationalError("server closed the connection")
+    assert conn.closed
+    assert pool.stats()["size"] == 0
+    assert pool.getconn() is opened[1]
+
+
+def test_discard_lets_a_waiter_open_a_new_connection():
+    pool, opened = make_pool(maxconn=1)
+    conn = pool.getconn()
+    results = []
+    waiter = start_waiter(pool, results, 'waiter')
+    wait_for(lambda: pool.stats()["waiters"] == 1)
+    pool.putconn(conn, discard=True)
+    waiter.join()
+    assert results == [('waiter', opened[1])]
+    assert conn.closed
+    assert pool.stats()["size"] == 1
+
+
+def test_failed_open_releases_its_place():
+    calls = []
+
+    def connect():
+        calls.append(1)
+        if len(calls) == 1:
+            raise psycopg2.OperationalError("connection refused")
+        return FakeConnection(len(calls))
+
+    pool = ConnectionPool(connect, minconn=0, maxconn=1, ping_after=None)
+    with pytest.raises(psycopg2.OperationalError):
+        pool.getconn()
+    assert pool.stats()["size"] == 0
+    assert pool.getconn(timeout=0.05).number == 2
+
+
+def test_closeall_wakes_waiters():
+    pool, _ = make_pool(maxconn=1)
+    conn = pool.getconn()
+    results = []
+    waiter = start_waiter(pool, results, 'waiter', timeout=10)
+    wait_for(lambda: pool.stats()["waiters"] == 1)
+    started = time.monotonic()
+    pool.closeall()
+    waiter.join(2)
+    assert not waiter.is_alive()
+    assert time.monotonic() - started < 1
+    assert isinstance(results[0][1], PoolTimeout)
+
+    pool.putconn(conn)
+    assert conn.closed
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
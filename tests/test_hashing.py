@@ -0,0 +1,111 @@
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from hashing import HasherBusy, PasswordHasher, hash_cost
+
+START_METHODS = multiprocessing.get_all_start_methods()
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+@pytest.fixture(params=START_METHODS)
+def hasher(request):
+    hasher = PasswordHasher(rounds=4, workers=1, start_method=request.param)
+    hasher.start()
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hash_and_verify(hasher):
+    pw_hash = hasher.hash('secret')
+    assert hash_cost(pw_hash) == 4
+    assert hasher.verify('secret', pw_hash) == (True, None)
+    assert hasher.verify('wrong', pw_hash) == (False, None)
+    assert hasher.verify_dummy('secret') is False
+
+
+def test_verify_upgrades_other_costs(hasher):
+    old_hash = hasher.hash('secret')
+    hasher.rounds = 5
+    ok, new_hash = hasher.verify('secret', old_hash)
+    assert ok and hash_cost(new_hash) == 5
+    assert hasher.verify('secret', new_hash) == (True, None)
+    assert hasher.stats()["upgraded"] == 1
+
+
+def test_rejects_when_queue_is_full():
+    hasher = PasswordHasher(rounds=4, workers=1, max_pending=1)
+    hasher.start()
+    try:
+        assert hasher._slots.acquire(blocking=False)
+        with pytest.raises(HasherBusy):
+            hasher.hash('secret')
+        assert hasher.stats()["rejected"] == 1
+    finally:
+        hasher._slots.release()
+        hasher.shutdown()
+
+
+def test_starts_on_first_use():
+    hasher = PasswordHasher(rounds=None, workers=1, target_time=0.001)
+    try:
+        assert hasher.stats()["rounds"] is None
+        pw_hash = hasher.hash('secret')
+        assert hash_cost(pw_hash) == hasher.rounds == 10
+        assert hasher.verify_dummy('secret') is False
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.parametrize('start_method', [m for m in START_METHODS if m != 'fork'])
+def test_module_level_hasher_in_a_reimported_script(tmp_path, start_method):
+    # spawn and forkserver workers re-import the main script; building a hasher there must not start a pool
+    script = tmp_path / 'launcher.py'
+    script.write_text(
+        "import sys\n"
+        f"sys.path.insert(0, {ROOT!r})\n"
+        "from hashing import PasswordHasher\n"
+        f"hasher = PasswordHasher(rounds=4, workers=1, start_method={start_method!r})\n"
+        "if __name__ == '__main__':\n"
+        "    print(hasher.verify('x', hasher.hash('x'))[0])\n"
+    )
+    result = subprocess.run([sys.executable, str(script)], capture_output=True, text=True, timeout=60)
+    assert result.stdout.strip() == 'True', result.stderr
+
+
+def test_hash_cost():
+    assert hash_cost('$2b$12$abcdefghijklmnopqrstuv') == 12
+    assert hash_cost('plain') is None
+    assert hash_cost(None) is None
+
+
+def _alive(pid):
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().split(') ', 1)[1][0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc'), reason="needs /proc")
+@pytest.mark.parametrize('start_method', START_METHODS)
+def test_workers_exit_when_the_app_is_killed(start_method):
+    code = (
+        "import sys, time; from hashing import PasswordHasher;"
+        f"h = PasswordHasher(rounds=4, workers=2, start_method={start_method!r}); h.start(); h.hash('x');"
+        "print(*h._executor._processes, flush=True); time.sleep(60)"
+    )
+    app = subprocess.Popen([sys.executable, '-c', code], cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    workers = [int(pid) for pid in app.stdout.readline().split()]
+    assert workers and all(_alive(pid) for pid in workers)
+    app.send_signal(signal.SIGKILL)
+    app.wait()
+    deadline = time.monotonic() + 5
+    while any(_alive(pid) for pid in workers) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not any(_alive(pid) for pid in workers)
@@ -0,0 +1,67 @@
+import json
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+import logs
+from logs import SamplingFilter, StructuredFormatter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(logs, 'time', SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def record(level=logging.WARNING, msg="Database error: %s", args=("down",), name='trivago', fields=None):
+    rec = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    if fields is not None:
+        rec.fields = fields
+    return rec
+
+
+def test_warnings_are_limited_per_message_and_window(clock):
+    sampling = SamplingFilter(burst=2, window=10.0)
+    assert [sampling.filter(record()) for _ in range(5)] == [True, True, False, False, False]
+    # Another message has its own budget
+    assert sampling.filter(record(msg="Pool exhausted"))
+    clock.now += 10.0
+    first = record()
+    assert sampling.filter(first)
+    assert first.suppressed == 3
+    assert not hasattr(record(), 'suppressed')
+
+
+def test_info_records_are_sampled(monkeypatch):
+    sampling = SamplingFilter(sample_rate=0.25)
+    draws = iter([0.1, 0.3, 0.2, 0.9])
+    monkeypatch.setattr(logs, 'random', SimpleNamespace(random=lambda: next(draws)))
+    assert [sampling.filter(record(logging.INFO)) for _ in range(4)] == [True, False, True, False]
+
+
+def test_full_sample_rate_keeps_every_info_record(clock):
+    sampling = SamplingFilter(sample_rate=1.0, burst=1)
+    assert all(sampling.filter(record(logging.INFO)) for _ in range(100))
+
+
+def test_key_value_format_quotes_values_with_spaces():
+    rec = record(logging.INFO, "request", (), fields={"route": "/api/flights", "ms": 12.5, "note": "two words"})
+    rec.suppressed = 4
+    line = StructuredFormatter().format(rec)
+    assert line.split(' ', 1)[1] == 'level=info logger=trivago msg=request route=/api/flights ms=12.5 note="two words" suppressed=4'
+
+
+def test_json_format():
+    document = json.loads(StructuredFormatter(as_json=True).format(record(fields={"status": 500})))
+    assert document["level"] == 'warning' and document["msg"] == 'Database error: down' and document["status"] == 500
+    assert document["ts"].endswith('Z')
@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+
+import pytest
+
+import metrics
+from metrics import Histogram, MetricsRegistry, stats_families
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(metrics, 'time', SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def test_quantile_interpolates_inside_the_bucket():
+    histogram = Histogram('h', 'help', buckets=(1.0, 2.0, 4.0))
+    assert histogram._quantile([0, 4, 0, 0], 0.5) == 1.5
+    assert histogram._quantile([2, 0, 2, 0], 0.5) == 1.0
+    assert histogram._quantile([2, 0, 2, 0], 0.75) == 3.0
+
+
+def test_quantile_of_empty_and_overflow_buckets():
+    histogram = Histogram('h', 'help', buckets=(1.0, 2.0, 4.0))
+    assert histogram._quantile([0, 0, 0, 0], 0.5) is None
+    # Observations above the last bound are reported at that bound, like histogram_quantile()
+    assert histogram._quantile([0, 0, 0, 3], 0.99) == 4.0
+
+
+def test_render_histogram_in_prometheus_text_format(clock):
+    registry = MetricsRegistry()
+    histogram = registry.histogram('latency_seconds', 'Latency', ('route',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, '/a')
+    histogram.observe(0.5, '/a')
+    histogram.observe(5.0, '/a')
+    text = registry.render()
+    assert text.endswith('\n')
+    lines = text.splitlines()
+    assert lines[:2] == ['# HELP latency_seconds Latency', '# TYPE latency_seconds histogram']
+    assert lines[2:7] == [
+        'latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a",le="1.0"} 2',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 3',
+        'latency_seconds_sum{route="/a"} 5.55',
+        'latency_seconds_count{route="/a"} 3',
+    ]
+    assert '# TYPE latency_seconds_recent gauge' in lines
+    assert 'latency_seconds_recent{route="/a",quantile="0.5"} 0.55' in lines
+
+
+def test_recent_quantiles_forget_old_windows(clock):
+    registry = MetricsRegistry()
+    histogram = registry.histogram('h', 'help', buckets=(1.0,), window=60.0)
+    histogram.observe(0.5)
+    clock.now += 60.0
+    assert 'h_recent{quantile="0.5"} 0.5' in registry.render()
+    clock.now += 60.0
+    text = registry.render()
+    assert 'h_recent{' not in text
+    # The cumulative buckets keep every observation
+    assert 'h_count 1' in text
+
+
+def test_render_escapes_label_values():
+    registry = MetricsRegistry()
+    counter = registry.counter('requests_total', 'Requests', ('path',))
+    counter.inc('a"b\\c\nd', amount=2)
+    assert 'requests_total{path="a\\"b\\\\c\\nd"} 2' in registry.render()
+
+
+def test_failing_collector_does_not_break_render(caplog):
+    registry = MetricsRegistry()
+    registry.counter('ok_total', 'Fine').inc()
+
+    @registry.collector
+    def broken():
+        raise RuntimeError("boom")
+
+    text = registry.render()
+    assert 'ok_total 1' in text
+    assert "Metrics collector broken failed" in caplog.text
+
+
+def test_stats_families_split_counters_and_gauges():
+    families = stats_families('pool', [({"db": "a"}, {"size": 4, "hits": 10, "mode": "lifo"}), ({"db": "b"}, {"size": 2, "hits": 1})],
+                              counters=('hits',))
+    assert families == [
+        ('pool_size', 'gauge', 'pool size', [('pool_size', {"db": "a"}, 4), ('pool_size', {"db": "b"}, 2)]),
+        ('pool_hits_total', 'counter', 'pool hits', [('pool_hits_total', {"db": "a"}, 10), ('pool_hits_total', {"db": "b"}, 1)]),
+    ]
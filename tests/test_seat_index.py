@@ -0,0 +1,211 @@
+import threading
+import time
+from datetime import date, timedelta
+
+from seat_index import FULL_MASK, SEAT_BITS, SEAT_CODES, SEAT_DICTS, SeatIndex, has_free_block, seat_mask, seats_from_mask
+
+
+def free(*seats):
+    return seat_mask(seats)
+
+
+def test_seat_mask_bits():
+    assert seat_mask(['1A']) == 1
+    assert seat_mask(['1D', '2A']) == 1 << 3 | 1 << 4
+    assert seat_mask(['20D']) == 1 << 79
+    assert seat_mask(['21A', '0A', '1E', '']) == 0
+    assert seat_mask(SEAT_CODES) == FULL_MASK
+
+
+def test_seats_from_mask_round_trip():
+    seats = ['20D', '1A', '10B', '2C']
+    result = seats_from_mask(seat_mask(seats))
+    assert [s["fila"] + s["posicion"] for s in result] == ['1A', '2C', '10B', '20D']
+    assert seats_from_mask(0) == []
+    assert seats_from_mask(FULL_MASK) == list(SEAT_DICTS)
+    assert all(seats_from_mask(bit)[0] is SEAT_DICTS[i] for i, bit in enumerate(SEAT_BITS.values()))
+
+
+def test_has_free_block_within_a_row():
+    assert has_free_block(free('3A', '3B'), 2)
+    assert not has_free_block(free('3A', '3B'), 3)
+    assert not has_free_block(free('3A', '3C'), 2)
+    # The aisle between B and C does not split a block
+    assert has_free_block(free('3B', '3C'), 2)
+    assert has_free_block(FULL_MASK, 4)
+    assert has_free_block(free('20A', '20B', '20C', '20D'), 4)
+
+
+def test_has_free_block_does_not_wrap_rows():
+    assert not has_free_block(free('1D', '2A'), 2)
+    assert not has_free_block(free('1C', '1D', '2A', '2B'), 3)
+    assert not has_free_block(free('20D'), 2)
+
+
+def test_has_free_block_sizes():
+    assert has_free_block(0, 0)
+    assert has_free_block(free('5A'), 1)
+    assert not has_free_block(0, 1)
+    assert not has_free_block(FULL_MASK, 5)
+
+
+def test_index_merges_seats_claimed_while_loading():
+    index = SeatIndex()
+    key = ('AA100', date(2099, 1, 1))
+
+    class Loading:
+        def __enter__(self):
+            # Another request books 1B while this flight is being loaded
+            index.mark_booked(*key, ['1B'])
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def cursor(self):
+            return Cursor()
+
+    class Cursor:
+        def execute(self, query, params):
+            assert params == key
+
+        def fetchall(self):
+            return [('1A',)]
+
+        def close(self):
+            pass
+
+    assert index.booked(Loading, *key) == seat_mask(['1A', '1B'])
+    assert index.booked(None, *key) == seat_mask(['1A', '1B'])
+
+
+def test_free_blocks_only_count_offered_seats():
+    index = SeatIndex()
+    day = date(2099, 1, 1)
+    sample = seat_mask(['1A', '1B', '2C', '2D', '5A', '10B'])
+    index.set_offered('AA100', day, sample)
+    index.set_offered('AA200', day, FULL_MASK)
+    index.set_offered('AA300', date(2099, 1, 2), FULL_MASK)
+    index.load_rows([('AA100', day, '1A'), ('AA400', day, '1A')])
+    # Flights without bookings are indexed with an empty mask when their seat map is first served
+    for flight_code, flight_date in (('AA200', day), ('AA300', date(2099, 1, 2))):
+        index.booked(GatedDatabase.loaded([]), flight_code, flight_date)
+
+    # AA100 only offers pairs; AA200 has no bookings; AA400 has no seat map
+    assert sorted(index.flights_with_free_block(4)) == [('AA200', day), ('AA300', date(2099, 1, 2))]
+    assert sorted(index.flights_with_free_block(2, day)) == [('AA100', day), ('AA200', day)]
+    index.mark_booked('AA100', day, ['2C'])
+    assert index.flights_with_free_block(2, day) == [('AA200', day)]
+
+
+class GatedDatabase:
+    """conn_factory whose query returns ``seats`` once ``release`` is set, counting the queries."""
+
+    def __init__(self, seats):
+        self.seats = seats
+        self.queries = 0
+        self.release = threading.Event()
+
+    @classmethod
+    def loaded(cls, seats):
+        db = cls(seats)
+        db.release.set()
+        return db
+
+    def __call__(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, params):
+        self.queries += 1
+        assert self.release.wait(2)
+
+    def fetchall(self):
+        return [(seat,) for seat in self.seats]
+
+    def close(self):
+        pass
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.001)
+
+
+def test_concurrent_misses_share_one_load():
+    index = SeatIndex()
+    key = ('AA100', date(2099, 1, 1))
+    db = GatedDatabase(['2B'])
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(index.booked(db, *key))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: index.stats()["misses"] == 2)
+    db.release.set()
+    for thread in threads:
+        thread.join()
+    assert db.queries == 1
+    assert results == [seat_mask(['2B'])] * 2
+
+    # A sale recorded after the load must not be overwritten by a second, older snapshot
+    index.mark_booked(*key, ['1A'])
+    assert index.booked(None, *key) == seat_mask(['1A', '2B'])
+
+
+def test_invalidate_during_load_discards_its_result():
+    index = SeatIndex()
+    key = ('AA100', date(2099, 1, 1))
+    db = GatedDatabase([])
+    thread = threading.Thread(target=index.booked, args=(db, *key))
+    thread.start()
+    wait_for(lambda: db.queries == 1)
+    index.invalidate(*key)
+    db.release.set()
+    thread.join()
+
+    reload = GatedDatabase(['1A'])
+    reload.release.set()
+    assert index.booked(reload, *key) == seat_mask(['1A'])
+    assert reload.queries == 1
+
+
+def test_free_blocks_skip_flights_without_a_booked_mask():
+    index = SeatIndex()
+    day = date(2099, 1, 1)
+    index.set_offered('AA100', day, seat_mask(['1A', '1B', '1C', '1D']))
+    index.load_rows([('AA100', day, seat) for seat in ('1A', '1B', '1C', '1D')])
+    assert index.flights_with_free_block(1) == []
+
+    # After a conflict the flight is invalidated; it must not look empty until reloaded
+    index.invalidate('AA100', day)
+    assert index.flights_with_free_block(1) == []
+    index.set_offered('AA200', day, FULL_MASK)
+    assert index.flights_with_free_block(4) == []
+
+
+def test_index_is_bounded_and_forgets_past_flights():
+    index = SeatIndex(maxsize=2)
+    day = date.today()
+    for flight_code in ('AA100', 'AA200', 'AA300'):
+        index.booked(GatedDatabase.loaded(['1A']), flight_code, day)
+        index.set_offered(flight_code, day, FULL_MASK)
+    index.booked(None, 'AA200', day)
+    index.booked(GatedDatabase.loaded([]), 'AA400', day)
+    assert sorted(index._booked) == [('AA200', day), ('AA400', day)]
+    assert sorted(index._offered) == [('AA200', day), ('AA300', day)]
+
+    index = SeatIndex()
+    index.load_rows([('AA100', day - timedelta(days=1), '1A'), ('AA200', day, '1A')])
+    index.set_offered('AA300', day, FULL_MASK)
+    assert list(index._booked) == [('AA200', day)]
+    assert index.stats()["flights"] == 1
@@ -0,0 +1,78 @@
+import io
+import json
+from datetime import date
+from decimal import Decimal
+
+from serializers import iter_xml, parse_document, parse_xml, to_json
+
+
+def xml(payload, root=None):
+    return ''.join(iter_xml(payload, root))
+
+
+def round_trip(payload, root=None):
+    return parse_xml(io.BytesIO(xml(payload, root).encode('utf-8')))
+
+
+FLIGHTS = {"lista_vuelos": {"fecha": "20991101", "origen": "GUA", "destino": "MIA", "vuelos": [
+    {"aerolinea": "AA", "numero": "100", "hora": "0830", "precio": "380.50"},
+    {"aerolinea": "GU", "numero": "200", "hora": "1415", "precio": "410.00"},
+]}}
+
+
+def test_flight_list_round_trip():
+    text = xml(FLIGHTS)
+    assert text.startswith('<?xml version="1.0" encoding="UTF-8"?>\n<lista_vuelos><fecha>20991101</fecha>')
+    assert '<vuelo><aerolinea>AA</aerolinea><numero>100</numero>' in text
+    assert round_trip(FLIGHTS) == FLIGHTS
+
+
+def test_single_item_list_round_trip():
+    seats = {"lista_asientos": {"aerolinea": "GU", "numero": "123", "fecha": "20991101", "origen": "GUA",
+                                "destino": "MIA", "avion": "Airbus A320", "asientos": [{"fila": "1", "posicion": "A"}]}}
+    assert round_trip(seats) == seats
+
+
+def test_wrapped_lists_round_trip():
+    conflict = {"respuesta": {"error": "Seats already booked", "asientos_ocupados": ["1A", "1B"]}}
+    assert xml(conflict["respuesta"]).endswith('<asientos_ocupados><asiento>1A</asiento><asiento>1B</asiento></asientos_ocupados></respuesta>')
+    assert round_trip(conflict["respuesta"]) == conflict
+
+    boletos = [{"id": "1", "asiento": "1A"}, {"id": "2", "asiento": "1B"}]
+    assert xml({"boletos": boletos}).endswith('<boletos><boleto><id>1</id><asiento>1A</asiento></boleto><boleto><id>2</id><asiento>1B</asiento></boleto></boletos>')
+    assert round_trip({"boletos": boletos}) == {"boletos": boletos}
+
+
+def test_single_field_payloads_are_wrapped():
+    assert xml({"error": "Invalid date"}) == '<?xml version="1.0" encoding="UTF-8"?>\n<respuesta><error>Invalid date</error></respuesta>'
+    assert round_trip({"error": "Invalid date"}) == {"respuesta": {"error": "Invalid date"}}
+    assert round_trip({"message": "ok"}) == {"respuesta": {"message": "ok"}}
+
+
+def test_nested_dict_and_scalar_types():
+    payload = {"message": "Login successful", "user": {"id": 7, "full_name": "Ana & Luis <test>"}}
+    assert round_trip(payload) == {"respuesta": {"message": "Login successful", "user": {"id": "7", "full_name": "Ana & Luis <test>"}}}
+    text = xml({"boleto": {"precio": Decimal("380.50"), "fecha": date(2099, 11, 1), "pagado": True, "nota": None}})
+    assert '<precio>380.50</precio><fecha>2099-11-01</fecha><pagado>true</pagado><nota></nota>' in text
+
+
+def test_parse_xml_renames_field_aliases():
+    document = (b'<lista_vuelos><fecha>20991101</fecha><origin>GUA</origin><design>MIA</design>'
+                b'<vuelo><aerolinea>AA</aerolinea><horaz>0830</horaz></vuelo>'
+                b'<vuelo><aerolinea>GU</aerolinea><horra>1415</horra></vuelo></lista_vuelos>')
+    assert parse_xml(io.BytesIO(document)) == {"lista_vuelos": {"fecha": "20991101", "origen": "GUA", "destino": "MIA", "vuelos": [
+        {"aerolinea": "AA", "hora": "0830"}, {"aerolinea": "GU", "hora": "1415"},
+    ]}}
+    seats = b'<lista_asientos><asiento><file>1</file><position>A</position></asiento></lista_asientos>'
+    assert parse_xml(io.BytesIO(seats)) == {"lista_asientos": {"asientos": [{"fila": "1", "posicion": "A"}]}}
+
+
+def test_parse_document_normalizes_json():
+    document = {"lista_vuelos": {"origin": "GUA", "design": "MIA", "vuelos": [{"horaz": "0830"}]}}
+    stream = io.BytesIO(json.dumps(document).encode('utf-8'))
+    assert parse_document(stream, 'application/json') == {"lista_vuelos": {"origen": "GUA", "destino": "MIA", "vuelos": [{"hora": "0830"}]}}
+    assert parse_document(io.BytesIO(xml(FLIGHTS).encode('utf-8')), 'application/xml') == FLIGHTS
+
+
+def test_to_json_handles_decimals_and_dates():
+    assert json.loads(to_json({"precio": Decimal("1.10"), "fecha": date(2099, 1, 2)})) == {"precio": "1.10", "fecha": "2099-01-02"}